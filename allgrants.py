@@ -1,71 +1,25 @@
-from flask import Flask, render_template
-import pandas as pd
+import argparse
 import os
-from datetime import datetime
 
-app = Flask(__name__, template_folder='templates')
+from grant_filters import ALL_PROFILE, agency_profile
+from site_generator import PAGE_SIZE, SITE_PROFILES, build_sites
 
-def generate_static_html():
-    csv_path = os.path.join('data', 'doge-grant-stub.csv')
-    try:
-        df_all = pd.read_csv(csv_path)
-    except Exception as e:
-        print(f"<h2>Error loading CSV file: {e}</h2>")
-        return
-
-    df_all['date'] = pd.to_datetime(df_all['date'], errors='coerce').dt.date
-    second_row_date = df_all['date'].iloc[1] if len(df_all) > 1 else "N/A"
-    last_any_grant_date = df_all['date'].max() if not df_all.empty else "N/A"
-
-    # No filtering—show all entries
-    df = df_all.copy()
-
-    # Counts for display
-    total_entries = len(df_all)
-    filtered_entries = len(df)  # This is now equal to total_entries
-
-    def clean_description(text, link, word_limit=50):
-        if not isinstance(text, str):
-            return ""
-        words = text.split()
-        truncated = ' '.join(words[:word_limit]) + ('...' if len(words) > word_limit else '')
-        if truncated:
-            truncated = truncated.lower()
-            truncated = truncated[0].upper() + truncated[1:]
-        if isinstance(link, str) and link.strip():
-            truncated += f' <a href="{link}" target="_blank">[LINK]</a>'
-        return truncated
-
-    df.loc[:, 'description_doge'] = df.apply(
-        lambda row: clean_description(row['description_doge'], row.get('link')), axis=1
-    )
-
-    def format_dollar(x):
-        try:
-            return f"${int(round(float(x))):,}"
-        except:
-            return x
-
-    df.loc[:, 'value'] = df['value'].apply(format_dollar)
-    df.loc[:, 'savings'] = df['savings'].apply(format_dollar)
-    df.loc[:, 'date'] = pd.to_datetime(df['date'], errors='coerce').dt.date
-
-    last_scraped = datetime.now().strftime('%Y-%m-%d')
-
-    with app.app_context():
-        html = render_template(
-            'index.html',
-            grants=df.to_dict(orient='records'),
-            last_scraped=last_scraped,
-            second_row_date=second_row_date,
-            last_hawaii_univ_date=last_any_grant_date,  # Renamed for template compatibility
-            total_entries=total_entries,
-            filtered_entries=filtered_entries
-        )
-
-    os.makedirs('docs', exist_ok=True)
-    with open('docs/index.html', 'w', encoding='utf-8') as f:
-        f.write(html)
+def generate_static_html(full=False, out_dir='docs', page_size=PAGE_SIZE, profile=ALL_PROFILE):
+    spec = dict(SITE_PROFILES['all'], profile=profile, out_dir=out_dir, page_size=page_size)
+    build_sites({'all': spec}, full=full, cache_name='all-' + os.path.normpath(out_dir).replace(os.sep, '_'))
 
 if __name__ == '__main__':
-    generate_static_html()
+    parser = argparse.ArgumentParser(description='Generate the paginated all-grants site from data/doge-grant-stub.csv')
+    parser.add_argument('--full', action='store_true', help='ignore the row cache and render every row')
+    parser.add_argument('--out-dir', default='docs')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help='grants per page')
+    parser.add_argument('--include', action='append', default=[], help='keep recipients containing this keyword')
+    parser.add_argument('--exclude', action='append', default=[], help='drop recipients containing this keyword')
+    parser.add_argument('--agency', help='keep grants whose agency contains this keyword')
+    args = parser.parse_args()
+    profile = dict(ALL_PROFILE)
+    if args.include or args.exclude:
+        profile['recipient'] = {'include': args.include, 'exclude': args.exclude}
+    if args.agency:
+        profile.update(agency_profile(args.agency))
+    generate_static_html(full=args.full, out_dir=args.out_dir, page_size=args.page_size, profile=profile)
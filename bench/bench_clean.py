@@ -0,0 +1,81 @@
+import argparse
+import os
+
+import pandas as pd
+
+from _common import REPO_DIR, load_script, timeit
+
+PROPERTY_STUB = os.path.join(REPO_DIR, 'data', 'doge-property-stub.csv')
+GRANT_SNAPSHOT = os.path.join(REPO_DIR, '.old', 'data3', 'doge-grant.csv')
+
+
+def safe_to_dt(dtstr):
+    try:
+        dt = pd.to_datetime(dtstr)
+    except:
+        dt = None
+    return dt
+
+
+def legacy_clean_stub_df(df):
+    # clean_stub_df as it was before vectorization, kept as the reference output
+    df.columns = [k.lower().replace(' ', '_') for k in df.keys()]
+    if 'uploaded_on' in df.keys():
+        df['uploaded_dt'] = [safe_to_dt(dts) for dts in df['uploaded_on'].values]
+    if 'location' in df.keys():
+        loc_part_list = [loc.split(', ') for loc in df['location'].values]
+        for idx, loc_part_tup in enumerate(loc_part_list):
+            city_pred = len(loc_part_tup[1]) == 2
+            df.loc[idx, 'city'] = loc_part_tup[0]
+            df.loc[idx, 'state'] = loc_part_tup[1] if city_pred else ''
+            if len(loc_part_tup) > 2:
+                df.loc[idx, 'agency'] = loc_part_tup[2] if city_pred else loc_part_tup[1]
+    if 'link' in df.keys():
+        df.link = df.link.fillna('')
+    if 'vendor' in df.keys():
+        df.loc[df.vendor == 'N/A', 'vendor'] = ''
+    return df
+
+
+def raw_inputs():
+    # Undo what the old scrapers derived so both functions start from raw API columns
+    prop_df = pd.read_csv(PROPERTY_STUB).drop(columns=['city', 'state'])
+    lease_df = prop_df.copy()
+    lease_df['location'] = lease_df['location'] + ', ' + lease_df['agency'].astype(str)
+    lease_df.loc[::3, 'location'] = lease_df.loc[::3, 'location'].str.replace(r', \w\w,', ',', regex=True)
+    lease_df = lease_df.drop(columns=['agency'])
+    grant_df = pd.read_csv(GRANT_SNAPSHOT).rename(columns={'uploaded_on': 'Uploaded On'})
+    grant_df['link'] = None
+    return {'property stub': prop_df, 'lease (3-part location)': lease_df, 'grant snapshot': grant_df}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark clean_stub_df')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--legacy-max', type=int, default=10000,
+                        help='largest size the per-row legacy function is timed at')
+    args = parser.parse_args()
+    scrape = load_script('doge-scrape.py')
+
+    for label, df in raw_inputs().items():
+        expected = legacy_clean_stub_df(df.copy()).to_csv(index=False)
+        got = scrape.clean_stub_df(df.copy()).to_csv(index=False)
+        assert got == expected, 'output differs from legacy clean_stub_df on ' + label
+        print('identical output on {} ({} rows)'.format(label, len(df)))
+
+    inputs = raw_inputs()
+    for label in ('lease (3-part location)', 'grant snapshot'):
+        base_df = inputs[label]
+        for size in args.sizes:
+            df = base_df.sample(n=size, replace=True, random_state=0).reset_index(drop=True)
+            t_new, _ = timeit(lambda: scrape.clean_stub_df(df.copy()))
+            if size <= args.legacy_max:
+                t_old, _ = timeit(lambda: legacy_clean_stub_df(df.copy()), repeat=1)
+                print('{:<24} {:>7} rows  legacy {:.3f} s  vectorized {:.3f} s  ({:.0f}x)'.format(
+                    label, size, t_old, t_new, t_old / t_new))
+            else:
+                print('{:<24} {:>7} rows  vectorized {:.3f} s'.format(label, size, t_new))
+
+
+if __name__ == '__main__':
+    main()
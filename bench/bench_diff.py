@@ -0,0 +1,63 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from _common import REPO_DIR, timeit
+from doge_diff import diff_rows
+
+SNAPSHOT = os.path.join(REPO_DIR, '.old', 'data3', 'doge-grant.csv')
+
+
+def legacy_row_diff(old_df, stub_df):
+    # Per-row scan that df_row_diff_2 used before the fingerprint index
+    new_df = stub_df.copy()
+    drop_idx = []
+    for idx, row in new_df.iterrows():
+        match_series = (old_df[stub_df.columns] == row).all(axis=1)
+        if match_series.any():
+            drop_idx.append(np.arange(len(match_series))[match_series])
+            new_df = new_df.drop(idx, axis=0)
+    return new_df, drop_idx
+
+
+def make_stub(old_df, n_rows, frac_changed=0.01, frac_new=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    stub_df = old_df.sample(n=min(n_rows, len(old_df)), random_state=seed).reset_index(drop=True)
+    n_changed = int(len(stub_df) * frac_changed)
+    n_new = int(len(stub_df) * frac_new)
+    pick = rng.choice(len(stub_df), n_changed + n_new, replace=False)
+    stub_df.loc[pick[:n_changed], 'agency'] = stub_df.loc[pick[:n_changed], 'agency'] + ' (REVISED)'
+    stub_df.loc[pick[n_changed:], 'dt_scrape'] = 'NEW-' + pd.Series(pick[n_changed:]).astype(str).values
+    return stub_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the grant row diff')
+    parser.add_argument('--snapshot', default=SNAPSHOT)
+    parser.add_argument('--legacy-rows', type=int, default=300,
+                        help='stub rows for the legacy scan (it is O(N*M))')
+    args = parser.parse_args()
+
+    old_df = pd.read_csv(args.snapshot).fillna('')
+    stub_df = make_stub(old_df, len(old_df))
+    print('history rows: {}, stub rows: {}'.format(len(old_df), len(stub_df)))
+
+    t_new, (new_df, drop_idx, status) = timeit(diff_rows, old_df, stub_df)
+    print('indexed diff:  {:.3f} s  ({} new/changed, {} unchanged)'.format(
+        t_new, len(new_df), len(drop_idx)))
+
+    small_stub = stub_df.iloc[:args.legacy_rows]
+    t_legacy, (legacy_df, legacy_idx) = timeit(legacy_row_diff, old_df, small_stub, repeat=1)
+    t_small, (small_df, small_idx, _) = timeit(diff_rows, old_df, small_stub)
+    assert list(legacy_df.index) == list(small_df.index)
+    assert all((a == b).all() for a, b in zip(legacy_idx, small_idx))
+    per_row = t_legacy / len(small_stub)
+    print('legacy scan:   {:.3f} s for {} rows (~{:.1f} s extrapolated to {} rows)'.format(
+        t_legacy, len(small_stub), per_row * len(stub_df), len(stub_df)))
+    print('speedup:       ~{:.0f}x'.format(per_row * len(stub_df) / t_new))
+
+
+if __name__ == '__main__':
+    main()
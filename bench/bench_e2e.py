@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+
+import pandas as pd
+
+from _common import REPO_DIR, load_script
+from doge_cache import AwardCache, EnrichJournal
+from doge_report import RUN_LOG
+from doge_store import get_store
+from stub_server import StubServer, shipped_datasets
+
+RESULTS_DIR = os.path.join(REPO_DIR, 'bench', 'results')
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class StageTimer:
+    def __init__(self):
+        self.results = []
+
+    @contextmanager
+    def stage(self, name, **info):
+        t0 = time.perf_counter()
+        yield info
+        self.results.append(dict(stage=name, seconds=round(time.perf_counter() - t0, 4), **info))
+
+
+def previous_datasets(datasets, new_frac, changed_frac):
+    # What the API served on the run before: the newest new_frac of each
+    # endpoint's rows not there yet, and changed_frac of the rest with other savings
+    previous = {}
+    for endpoint_str, records in datasets.items():
+        records = [dict(r) for r in records[int(len(records) * new_frac):]]
+        for r in records[:int(len(records) * changed_frac)]:
+            r['savings'] = (r['savings'] or 0) - 1
+        previous[endpoint_str] = records
+    return previous
+
+
+def run_size(scrape, server, n_grants, args):
+    timer = StageTimer()
+    datasets = shipped_datasets(n_grants, seed=n_grants)
+
+    with tempfile.TemporaryDirectory(prefix='doge-e2e-') as tmp_dir:
+        scrape.DATA_DIR = tmp_dir
+        scrape.STORE = get_store(tmp_dir, args.storage)
+        scrape.HISTORY = None
+        scrape.STREAM = False
+        scrape.AWARD_CACHE = AwardCache(os.path.join(tmp_dir, 'usas-cache'))
+        scrape.ENRICH_JOURNAL = EnrichJournal(os.path.join(tmp_dir, 'usas-cache', 'journal.jsonl'))
+        scrape.N_REQ, scrape.LIMIT_S = args.calls, args.period
+        scrape.DOGE_PARAMS['per_page'] = args.per_page
+
+        # An untimed run stores the previous data, enriched, for the timed one to diff against
+        server.datasets.update(previous_datasets(datasets, args.new_frac, args.changed_frac))
+        server.error_rate = 0
+        scrape.main()
+        server.datasets.update(datasets)
+        server.error_rate = args.error_rate
+        scrape.main()
+        # The run report main() appended: scrape, then clean, changes, load, diff,
+        # enrich and save of each endpoint
+        with open(os.path.join(tmp_dir, RUN_LOG), encoding='utf-8') as f:
+            run = json.loads(f.readlines()[-1])
+        for entry in run['stages']:
+            timer.results.append(dict(stage=entry.pop('stage'), seconds=entry.pop('seconds'), **entry))
+        stub_df = scrape.STORE.load('doge-grant-stub')
+
+        site_generator = load_script('site_generator.py')
+        cwd = os.getcwd()
+        os.chdir(tmp_dir)
+        try:
+            with timer.stage('render', rows=len(stub_df)):
+                site_generator.build_sites(full=True, csv_path=os.path.join(tmp_dir, 'doge-grant-stub.csv'))
+            with timer.stage('render_incremental', rows=len(stub_df)):
+                site_generator.build_sites(csv_path=os.path.join(tmp_dir, 'doge-grant-stub.csv'))
+        finally:
+            os.chdir(cwd)
+    return [dict(size=n_grants, **result) for result in timer.results]
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old = {(r['size'], r['stage']): r['seconds'] for r in baseline['results']}
+    print('vs {} ({})'.format(baseline_path, baseline.get('commit')))
+    for r in results:
+        t_old = old.get((r['size'], r['stage']))
+        if t_old:
+            print('{:>7} {:<20} {:>8.3f} s -> {:>8.3f} s  ({:+.0%})'.format(
+                r['size'], r['stage'], t_old, r['seconds'], r['seconds'] / t_old - 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time every stage of a scrape run against a local stand-in server')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000], help='number of grants')
+    parser.add_argument('--new-frac', type=float, default=0.05, help='share of grants new since the last run')
+    parser.add_argument('--changed-frac', type=float, default=0.01, help='share of old grants with edited savings')
+    parser.add_argument('--latency', type=float, default=0.01, help='injected latency per request (s)')
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    parser.add_argument('--per-page', type=int, default=500)
+    parser.add_argument('--calls', type=int, default=1000, help='USASpending rate limit calls per period')
+    parser.add_argument('--period', type=float, default=1.0)
+    parser.add_argument('--storage', default='csv', help='storage backend, as DOGE_STORAGE')
+    parser.add_argument('--out', help='JSON results file (default: bench/results/e2e-<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to print per-stage changes against')
+    args = parser.parse_args()
+
+    scrape = load_script('doge-scrape.py')
+    results = []
+    with StubServer(latency_s=args.latency) as server:
+        # The pipeline's own entry point, pointed at the stand-in
+        scrape.scrape_datasets = partial(scrape.scrape_datasets, api_root=server.url + '/savings/')
+        scrape.DATASETS['grants']['enrich'] = partial(scrape.extend_grant_data,
+                                                      api_root=server.url + '/api/v2/awards/')
+        for n_grants in args.sizes:
+            size_results = run_size(scrape, server, n_grants, args)
+            for r in size_results:
+                print('{:>7} {:<20} {:>8.3f} s'.format(r['size'], r['stage'], r['seconds']))
+            results += size_results
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'cpus': os.cpu_count(),
+        'args': vars(args),
+        'results': results,
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, 'e2e-{}.json'.format(commit or 'local'))
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    with open(out_path, 'w') as f:
+        json.dump(report, f, indent=1)
+    print('wrote', out_path)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
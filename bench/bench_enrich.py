@@ -0,0 +1,77 @@
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+import requests as req
+
+from _common import load_script
+from doge_cache import AwardCache, EnrichJournal
+from doge_enrich import award_url
+from stub_server import StubServer
+
+
+def legacy_extend(grant_df, api_root):
+    # Sequential fetch + per-row concat that extend_grant_data used to do
+    usas_df = pd.DataFrame([])
+    for link in grant_df.link.values:
+        r = req.get(award_url(link, api_root))
+        row_df = pd.json_normalize(r.json(), sep='_').rename(columns={'description': 'description_usas'})
+        usas_df = pd.concat([usas_df, row_df], ignore_index=True)
+    return pd.concat([grant_df.reset_index(drop=True), usas_df], axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark USASpending enrichment against a stub server')
+    parser.add_argument('-n', type=int, default=200, help='number of grants')
+    parser.add_argument('--latency', type=float, default=0.25, help='injected latency per request (s)')
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--calls', type=int, default=100, help='rate limit calls per period')
+    parser.add_argument('--period', type=float, default=1.0)
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    links = ['https://www.usaspending.gov/award/ASST_NON_{:06d}_4900'.format(i) for i in range(args.n)]
+    links[::17] = [''] * len(links[::17])
+    grant_df = pd.DataFrame({'link': links, 'recipient': 'UNIVERSITY OF HAWAII'})
+
+    with StubServer(latency_s=args.latency) as server:
+        api_root = server.url + '/api/v2/awards/'
+        valid_df = grant_df[grant_df.link != ''].iloc[:max(1, args.n // 10)]
+        t0 = time.perf_counter()
+        legacy_df = legacy_extend(valid_df, api_root)
+        t_legacy = (time.perf_counter() - t0) / len(valid_df) * (grant_df.link != '').sum()
+
+        scrape = load_script('doge-scrape.py')
+        scrape.N_REQ, scrape.LIMIT_S = args.calls, args.period
+        scrape.AWARD_CACHE = AwardCache(tempfile.mkdtemp(prefix='usas-cache-'))
+        scrape.ENRICH_JOURNAL = EnrichJournal(os.path.join(scrape.AWARD_CACHE.cache_dir, 'journal.jsonl'))
+        server.error_rate = args.error_rate
+        server.n_requests = 0
+        t0 = time.perf_counter()
+        ext_df = scrape.extend_grant_data(grant_df, None, api_root=api_root)
+        t_async = time.perf_counter() - t0
+        n_cold = server.n_requests
+        # As after save_doge_data: the next run reads the cache, not the journal
+        scrape.ENRICH_JOURNAL.clear()
+
+        server.error_rate = 0.0
+        t0 = time.perf_counter()
+        warm_df = scrape.extend_grant_data(grant_df, None, api_root=api_root)
+        t_warm = time.perf_counter() - t0
+
+    assert list(ext_df.columns) == list(legacy_df.columns), 'column mismatch with legacy frame'
+    assert len(ext_df) == len(grant_df)
+    print('grants: {}  latency: {:.2f} s  error rate: {:.0%}  limit: {}/{} s'.format(
+        args.n, args.latency, args.error_rate, args.calls, args.period))
+    print('sequential (extrapolated): {:.2f} s'.format(t_legacy))
+    print('concurrent:                {:.2f} s  ({} requests incl. retries, {} enriched)'.format(
+        t_async, n_cold, ext_df['id'].notna().sum()))
+    print('warm cache:                {:.2f} s  ({} requests, {} enriched)'.format(
+        t_warm, server.n_requests - n_cold, warm_df['id'].notna().sum()))
+    scrape.AWARD_CACHE.report(calls=scrape.N_REQ, period=scrape.LIMIT_S)
+
+
+if __name__ == '__main__':
+    main()
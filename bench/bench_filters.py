@@ -0,0 +1,51 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from _common import REPO_DIR
+from grant_filters import UH_PROFILE, US_STATES, GrantIndex, state_university_profile
+
+
+def contains_mask(df, profile):
+    # The str.contains passes UHgrants.py used to run per filter
+    mask = np.ones(len(df), dtype=bool)
+    for column, rules in profile.items():
+        for keyword in rules.get('include', ()):
+            mask &= df[column].str.contains(keyword, case=False, na=False).values
+        for keyword in rules.get('exclude', ()):
+            mask &= ~df[column].str.contains(keyword, case=False, na=False).values
+    return mask
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark keyword profiles: str.contains vs GrantIndex')
+    parser.add_argument('--csv', default=os.path.join(REPO_DIR, 'data', 'doge-contract-stub.csv'))
+    parser.add_argument('--column', default='vendor', help='column holding recipient names')
+    parser.add_argument('--repeat', type=int, default=10, help='replicate the table this many times')
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    df = pd.concat([df] * args.repeat, ignore_index=True).rename(columns={args.column: 'recipient'})
+    profiles = [UH_PROFILE] + [state_university_profile(state) for state in US_STATES]
+
+    t0 = time.perf_counter()
+    expected = [contains_mask(df, profile) for profile in profiles]
+    t_contains = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index = GrantIndex(df)
+    got = [index.select(profile) for profile in profiles]
+    t_index = time.perf_counter() - t0
+
+    assert all((a == b).all() for a, b in zip(expected, got)), 'index and str.contains disagree'
+    print('{} rows, {} distinct recipients, {} profiles ({} matching rows in total)'.format(
+        len(df), len(index.column_index('recipient').names), len(profiles), sum(m.sum() for m in got)))
+    print('str.contains: {:.3f} s'.format(t_contains))
+    print('GrantIndex:   {:.3f} s (including index build)'.format(t_index))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import glob
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from _common import REPO_DIR, timeit
+from site_format import clean_description, format_dollar, format_grants
+
+# Shipped tables and where their grant-like columns live
+COLUMN_ALIASES = {
+    'description_doge': ('description_doge', 'description'),
+    'link': ('link', 'fpds_link'),
+    'value': ('value', 'annual_lease', 'ceiling_value'),
+    'savings': ('savings', 'saved', 'ceiling_value'),
+    'date': ('date', 'deleted_date', 'uploaded_on'),
+}
+
+
+def legacy_format_grants(df):
+    # format_grants as it was before vectorization, kept as the reference output
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        df.loc[:, 'description_doge'] = df.apply(
+            lambda row: clean_description(row['description_doge'], row.get('link')), axis=1
+        )
+        df.loc[:, 'value'] = df['value'].apply(format_dollar)
+        df.loc[:, 'savings'] = df['savings'].apply(format_dollar)
+        df.loc[:, 'date'] = pd.to_datetime(df['date'], errors='coerce').dt.date
+    return df
+
+
+def shipped_inputs():
+    inputs = {}
+    for path in sorted(glob.glob(os.path.join(REPO_DIR, 'data', '*.csv')) +
+                       glob.glob(os.path.join(REPO_DIR, '.old', '*', '*.csv'))):
+        raw = pd.read_csv(path, low_memory=False)
+        df = pd.DataFrame(index=raw.index)
+        for column, aliases in COLUMN_ALIASES.items():
+            found = [a for a in aliases if a in raw.columns]
+            if found:
+                df[column] = raw[found[0]]
+        if {'description_doge', 'value', 'savings', 'date'} <= set(df.columns):
+            inputs[os.path.relpath(path, REPO_DIR)] = df
+    return inputs
+
+
+def edge_cases():
+    long_text = ' '.join('Word{}'.format(i) for i in range(60))
+    return pd.DataFrame({
+        'description_doge': ['', '   ', 'ÉCOLE  Straße\tGRANT', long_text, ' '.join(['x'] * 50), np.nan,
+                             'ß start', 'a b\x1fc', 'one', 'two', 'three', 'four'],
+        'link': ['http://a', ' ', np.nan, 'http://b', '', 'http://c', 'x', 'y', 3.0, None, '  z ', 'w'],
+        'value': [0.5, 1.5, 2.5, -0.5, -1234567.5, np.nan, np.inf, 1e300, 2 ** 53 + 2.0, 1234.49, 7, -0.4],
+        'savings': ['1,000', '12.5', ' 7 ', 'abc', np.nan, None, 'nan', 'inf', 3, 4.5, True, '1e3'],
+        'date': ['5/1/2025', 'bad', np.nan, '2025-03-01', '', '1/2/2024', '5/1/2025', '5/1/2025', '5/1/2025',
+                 '5/1/2025', '5/1/2025', '5/1/2025'],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark the vectorized format_grants')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--legacy-max', type=int, default=100000,
+                        help='largest size the per-row legacy function is timed at')
+    args = parser.parse_args()
+
+    inputs = dict(shipped_inputs(), **{'edge cases': edge_cases()})
+    for label, df in inputs.items():
+        expected = legacy_format_grants(df.copy())
+        got = format_grants(df.copy())
+        assert got.to_csv(index=False) == expected.to_csv(index=False), 'output differs on ' + label
+        assert [type(v) for v in got.values.ravel()] == [type(v) for v in expected.values.ravel()], \
+            'value types differ on ' + label
+        print('identical output on {} ({} rows)'.format(label, len(df)))
+
+    base_df = pd.concat([df for label, df in inputs.items() if label.startswith('data')], ignore_index=True)
+    for size in args.sizes:
+        df = base_df.sample(n=size, replace=True, random_state=0).reset_index(drop=True)
+        unique_df = df.assign(description_doge=df['description_doge'] + ' #' + df.index.astype(str))
+        # Sampled rows repeat descriptions about as often as the scraped tables;
+        # the second variant makes every description distinct
+        for label, bench_df in (('sampled', df), ('unique descriptions', unique_df)):
+            t_new, _ = timeit(lambda: format_grants(bench_df.copy()))
+            if size <= args.legacy_max:
+                t_old, _ = timeit(lambda: legacy_format_grants(bench_df.copy()), repeat=1)
+                print('{:>7} rows, {:<20} legacy {:.3f} s  vectorized {:.3f} s  ({:.1f}x)'.format(
+                    size, label, t_old, t_new, t_old / t_new))
+            else:
+                print('{:>7} rows, {:<20} vectorized {:.3f} s'.format(size, label, t_new))
+
+if __name__ == '__main__':
+    main()
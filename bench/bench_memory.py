@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from _common import BENCH_DIR, load_script
+
+STUB_COLUMNS = ['date', 'agency', 'recipient', 'value', 'savings', 'link', 'description_doge']
+N_USAS_COLUMNS = 150
+N_STUB_ROWS = 20000
+
+
+def make_history(data_dir, n_rows, seed=0):
+    # Grant history with the wide USASpending columns extend_grant_data adds
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'date': pd.Timestamp('2025-01-20') + pd.to_timedelta(rng.integers(0, 200, n_rows), unit='D'),
+        'agency': rng.choice(['NSF', 'NIH', 'USDA', 'Department of Education'], n_rows),
+        'recipient': ['RECIPIENT {}'.format(i % 5000) for i in range(n_rows)],
+        'value': rng.uniform(0, 1e7, n_rows).round(2),
+        'savings': rng.uniform(0, 1e6, n_rows).round(2),
+        'link': ['https://www.usaspending.gov/award/ASST_NON_{:08d}'.format(i) for i in range(n_rows)],
+        'description_doge': ['Description of grant {} '.format(i) * 4 for i in range(n_rows)],
+    })
+    usas_df = pd.DataFrame({'usas_field_{}'.format(j): 'usas value {}'.format(j)
+                            for j in range(N_USAS_COLUMNS)}, index=df.index)
+    df = pd.concat([df, usas_df], axis=1)
+    df['dt_scrape'] = '2025-05-16-0633'
+    df.to_csv(os.path.join(data_dir, 'doge-grant.csv'), index=False)
+    df[STUB_COLUMNS].iloc[:N_STUB_ROWS].to_csv(os.path.join(data_dir, 'stub.csv'), index=False)
+
+
+def measure(data_dir, mode):
+    scrape = load_script('doge-scrape.py')
+    scrape.DATA_DIR = data_dir
+    scrape.STORE = scrape.get_store(data_dir, 'csv')
+    stub_df = scrape.apply_schema(pd.read_csv(os.path.join(data_dir, 'stub.csv')), scrape.GRANT_SCHEMA)
+    if mode == 'stream':
+        pre_grant = scrape.load_pre_index(stub_df.columns)
+    else:
+        pre_grant = scrape.load_pre_data(columns=stub_df.columns)
+    new_df, _ = scrape.df_row_diff_2(pre_grant, stub_df)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'mode': mode, 'peak_rss_mb': peak_mb, 'new_rows': len(new_df)}))
+
+
+def run_self(*args):
+    return subprocess.run([sys.executable, os.path.join(BENCH_DIR, 'bench_memory.py')] + list(args),
+                          capture_output=True, text=True, check=True).stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak RSS of loading and diffing the grant history')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20000, 80000])
+    parser.add_argument('--generate', nargs=2, metavar=('DATA_DIR', 'N_ROWS'), help=argparse.SUPPRESS)
+    parser.add_argument('--measure', nargs=2, metavar=('DATA_DIR', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.generate:
+        return make_history(args.generate[0], int(args.generate[1]))
+    if args.measure:
+        return measure(*args.measure)
+
+    print('{:>8} {:>10} {:>12} {:>12}'.format('rows', 'csv MB', 'full MB', 'stream MB'))
+    for n_rows in args.sizes:
+        data_dir = tempfile.mkdtemp(prefix='doge-mem-')
+        try:
+            # Every step runs in its own small process: the peak RSS of a
+            # parent is inherited by the children it forks.
+            run_self('--generate', data_dir, str(n_rows))
+            peaks = {}
+            for mode in ('full', 'stream'):
+                out = run_self('--measure', data_dir, mode)
+                peaks[mode] = json.loads(out.strip().splitlines()[-1])['peak_rss_mb']
+            csv_mb = os.path.getsize(os.path.join(data_dir, 'doge-grant.csv')) / 1024 ** 2
+            print('{:>8} {:>10.0f} {:>12.0f} {:>12.0f}'.format(n_rows, csv_mb, peaks['full'], peaks['stream']))
+        finally:
+            shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from _common import timeit
+from doge_enrich import awards_to_frame
+
+PUBLISHED_FIELDS = ['id', 'generated_unique_award_id', 'description_usas', 'total_obligation',
+                    'recipient_recipient_name', 'recipient_location_loc_0', 'awarding_agency_toptier_agency_name',
+                    'period_of_performance_start_date', 'period_of_performance_end_date']
+
+
+def usas_award(i, rng):
+    # Nested like a USASpending grant award: about 150 leaves four levels deep
+    def location(prefix):
+        return {'{}_{}'.format(prefix, k): 'value {} {}'.format(k, rng.integers(0, 50)) for k in range(12)}
+
+    def agency():
+        return {'id': int(rng.integers(0, 500)), 'has_agency_page': bool(rng.integers(0, 2)),
+                'toptier_agency': {'name': 'Agency {}'.format(rng.integers(0, 40)), 'code': '049',
+                                   'abbreviation': 'AG', 'slug': 'agency'},
+                'subtier_agency': {'name': 'Subtier {}'.format(rng.integers(0, 200)), 'code': '4900',
+                                   'abbreviation': 'SUB'},
+                'office_agency_name': None}
+
+    return {
+        'id': i,
+        'generated_unique_award_id': 'ASST_NON_{:07d}_4900'.format(i),
+        'fain': '{:07d}'.format(i), 'uri': None, 'category': 'grant', 'type': '04',
+        'type_description': 'PROJECT GRANT (B)',
+        'description': 'Award description {} '.format(i) * 5,
+        'total_obligation': float(rng.uniform(0, 1e7)), 'base_and_all_options': None,
+        'subaward_count': int(rng.integers(0, 5)), 'total_subaward_amount': None,
+        'awarding_agency': agency(), 'funding_agency': agency(),
+        'recipient': {'recipient_hash': 'h{}'.format(i), 'recipient_name': 'Recipient {}'.format(i % 5000),
+                      'recipient_uei': 'U{}'.format(i), 'business_categories': ['higher_education', 'nonprofit'],
+                      'parent_recipient_name': None, 'location': location('loc')},
+        'period_of_performance': {'start_date': '2024-01-01', 'end_date': '2026-12-31',
+                                  'last_modified_date': '2025-02-01'},
+        'place_of_performance': location('pop'),
+        'executive_details': {'officers': [{'name': None, 'amount': None}] * 5},
+        'cfda_info': [{'cfda_number': '47.076', 'cfda_title': 'Education and Human Resources',
+                       'total_funding_amount': float(rng.uniform(0, 1e6))}],
+        'account_obligations_by_defc': [], 'account_outlays_by_defc': [],
+        'transaction_obligated_amount': {'a{}'.format(k): float(k) for k in range(30)},
+        'funding_opportunity': {'number': None, 'goals': 'goals {}'.format(i)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flatten USASpending award JSON: json_normalize against awards_to_frame')
+    parser.add_argument('-n', type=int, default=20000, help='number of awards')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    records = [usas_award(i, rng) for i in range(args.n)]
+    t_ref, ref_df = timeit(lambda: pd.json_normalize(records, sep='_').rename(
+        columns={'description': 'description_usas'}), repeat=1)
+    schema = list(ref_df.columns)
+    runs = [('awards_to_frame', {}), ('known columns', {'columns': schema})]
+    runs += [('{} workers'.format(n), {'columns': schema, 'n_workers': n}) for n in args.workers]
+    print('{} awards, {} fields, {} cpus'.format(args.n, ref_df.shape[1], os.cpu_count()))
+    print('{:<28} {:>8.3f} s'.format('json_normalize', t_ref))
+    for label, kwargs in runs:
+        t, usas_df = timeit(awards_to_frame, records, repeat=1, **kwargs)
+        pd.testing.assert_frame_equal(usas_df, ref_df)
+        print('{:<28} {:>8.3f} s'.format(label, t))
+    t, usas_df = timeit(awards_to_frame, records, fields=PUBLISHED_FIELDS, repeat=1)
+    pd.testing.assert_frame_equal(usas_df, ref_df[PUBLISHED_FIELDS])
+    print('{:<28} {:>8.3f} s  ({:.1f} MB instead of {:.1f} MB)'.format(
+        '{} fields only'.format(len(PUBLISHED_FIELDS)), t, usas_df.memory_usage(deep=True).sum() / 1024 ** 2,
+        ref_df.memory_usage(deep=True).sum() / 1024 ** 2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from _common import REPO_DIR, load_script, timeit
+from stub_server import grant_records
+
+SNAPSHOT = os.path.join(REPO_DIR, '.old', 'data3', 'doge-grant.csv')
+OLD_SCHEMA = {'date': 'datetime', 'value': 'float64', 'savings': 'float64',
+              'agency': 'category', 'recipient': 'category', 'state': 'category'}
+
+
+def make_history(scrape, data_dir, n_usas, seed=0):
+    """The grant snapshot as a history table, widened like extend_grant_data widens it.
+
+    Returns the stub the next run would scrape: the history's DOGE columns
+    with the newest 5% of grants not stored yet.
+    """
+    n_rows = len(pd.read_csv(SNAPSHOT, usecols=[0]))
+    stub_df = scrape.records_to_stub(grant_records(n_rows, seed))
+    rng = np.random.default_rng(seed)
+    # USASpending fields: some repeat across awards (agency names, types), most do not
+    usas_df = pd.DataFrame({
+        'usas_field_{}'.format(j): ['usas {} {}'.format(j, v) for v in rng.integers(0, 20 if j % 3 else n_rows, n_rows)]
+        for j in range(n_usas)})
+    history = pd.concat([stub_df, usas_df], axis=1)
+    history['dt_scrape'] = rng.choice(['2025-05-{:02d}-0633'.format(d) for d in range(1, 15)], n_rows)
+    n_new = n_rows // 20
+    scrape.STORE.save('doge-grant', history.iloc[n_new:])
+    return stub_df
+
+
+def load_filled(scrape):
+    # The history as it used to be held: every column read, dates, amounts and
+    # a few labels typed, then fillna('') turning any column with a gap into objects
+    df = scrape.STORE.load('doge-grant', schema=OLD_SCHEMA)
+    for col in df.select_dtypes('category'):
+        df[col] = df[col].cat.add_categories('')
+    return df.fillna('')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Memory and diff time of the grant history, untyped against the typed schema')
+    parser.add_argument('--usas-columns', type=int, default=150, help='USASpending columns in the history')
+    args = parser.parse_args()
+
+    scrape = load_script('doge-scrape.py')
+    data_dir = tempfile.mkdtemp(prefix='doge-schema-')
+    try:
+        scrape.DATA_DIR = data_dir
+        scrape.STORE = scrape.get_store(data_dir, 'csv')
+        scrape.HISTORY = None
+        stub_df = make_history(scrape, data_dir, args.usas_columns)
+        loaders = [
+            ("fillna(''), all columns", lambda: load_filled(scrape)),
+            ('typed, all columns', lambda: scrape.load_pre_data()),
+            ('typed, stub columns', lambda: scrape.load_pre_data(columns=stub_df.columns)),
+        ]
+        print('{} grant rows, {} USASpending columns'.format(len(stub_df), args.usas_columns))
+        print('{:<24} {:>8} {:>11} {:>8} {:>8} {:>6}'.format('history', 'columns', 'memory MB', 'load s', 'diff s', 'new'))
+        for label, load in loaders:
+            t_load, pre_df = timeit(load, repeat=1)
+            t_diff, (new_df, _) = timeit(scrape.df_row_diff_2, pre_df, stub_df, repeat=3)
+            print('{:<24} {:>8} {:>11.1f} {:>8.3f} {:>8.3f} {:>6}'.format(
+                label, pre_df.shape[1], pre_df.memory_usage(deep=True).sum() / 1024 ** 2, t_load, t_diff,
+                len(new_df)))
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
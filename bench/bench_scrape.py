@@ -0,0 +1,51 @@
+import argparse
+import time
+
+from _common import load_script
+from stub_server import StubServer, shipped_datasets
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark paginated DOGE scraping against a stub server')
+    parser.add_argument('--latency', type=float, default=0.3, help='injected latency per page (s)')
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--per-page', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--grants', type=int, default=15000, help='number of grants served')
+    args = parser.parse_args()
+
+    datasets = shipped_datasets(args.grants)
+    scrape = load_script('doge-scrape.py')
+    params = {'sort_by': 'date', 'sort_order': 'desc', 'per_page': args.per_page}
+
+    with StubServer(latency_s=args.latency, error_rate=args.error_rate, datasets=datasets) as server:
+        api_root = server.url + '/savings/'
+        t_alone = {}
+        for endpoint_str, records in datasets.items():
+            timings = {}
+            for n_workers in (1, args.workers):
+                t0 = time.perf_counter()
+                df = scrape.scrape_doge_endpoint(api_root, endpoint_str, params, n_workers=n_workers)
+                timings[n_workers] = time.perf_counter() - t0
+                key = df.columns[0]
+                assert df[key].tolist() == [r[key] for r in records], 'page order broken'
+            print('{:<10} {:>6} rows  sequential {:.2f} s  {} workers {:.2f} s'.format(
+                endpoint_str, len(records), timings[1], args.workers, timings[args.workers]))
+            t_alone[endpoint_str] = timings[args.workers]
+
+        # Every endpoint at once on one session and one page budget vs one after the other
+        t0 = time.perf_counter()
+        for endpoint_str in datasets:
+            scrape.scrape_doge_endpoint(api_root, endpoint_str, params, n_workers=args.workers)
+        t_each = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        scraped = scrape.scrape_datasets(list(datasets), api_root=api_root, n_workers=args.workers)
+        t_all = time.perf_counter() - t0
+        for endpoint_str, (stub_df, _, _) in scraped.items():
+            assert len(stub_df) == len(datasets[endpoint_str]), 'rows missing from ' + endpoint_str
+        print('all endpoints, {} workers: one after the other {:.2f} s  concurrently {:.2f} s  '
+              '(slowest endpoint alone {:.2f} s)'.format(args.workers, t_each, t_all, max(t_alone.values())))
+
+
+if __name__ == '__main__':
+    main()
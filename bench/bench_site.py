@@ -0,0 +1,65 @@
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from _common import REPO_DIR
+from grant_filters import US_STATES, state_university_profile
+from site_generator import SITE_PROFILES, build_sites
+
+
+def make_stub(csv_path, out_path, repeat):
+    # Contract stub reshaped into the grant stub columns the site reads
+    df = pd.read_csv(csv_path).rename(columns={'vendor': 'recipient', 'fpds_link': 'link', 'deleted_date': 'date'})
+    df = pd.concat([df] * repeat, ignore_index=True)
+    df['link'] = df['link'].fillna('') + '#' + df.index.astype(str)
+    df[['date', 'agency', 'recipient', 'value', 'savings', 'link', 'description_doge']].to_csv(out_path, index=False)
+    return len(df)
+
+
+def site_profiles(n_profiles):
+    # The configured sites, then one single-page site per state university
+    profiles = dict(SITE_PROFILES)
+    for state in US_STATES:
+        slug = state.lower().replace(' ', '-')
+        profiles[slug] = {'profile': state_university_profile(state), 'out_dir': os.path.join('docs', slug)}
+    return dict(list(profiles.items())[:n_profiles])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark building K sites one by one vs in one batch')
+    parser.add_argument('--csv', default=os.path.join(REPO_DIR, 'data', 'doge-contract-stub.csv'))
+    parser.add_argument('--repeat', type=int, default=5, help='replicate the table this many times')
+    parser.add_argument('--profiles', type=int, default=8, help='number of sites to build')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    profiles = site_profiles(args.profiles)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        os.makedirs('data')
+        n_rows = make_stub(args.csv, os.path.join('data', 'doge-grant-stub.csv'), args.repeat)
+        print('{} rows, {} sites: {}'.format(n_rows, len(profiles), ', '.join(profiles)))
+
+        t0 = time.perf_counter()
+        for name, spec in profiles.items():
+            build_sites({name: spec}, full=True, cache_name=name)
+        t_separate = time.perf_counter() - t0
+        print('{:<22} {:.3f} s'.format('separate runs:', t_separate))
+
+        for label, workers in (('one batch', 1), ('one batch, {} workers'.format(args.workers), args.workers)):
+            t0 = time.perf_counter()
+            build_sites(profiles, full=True, workers=workers)
+            print('{:<22} {:.3f} s'.format(label + ':', time.perf_counter() - t0))
+
+        t0 = time.perf_counter()
+        build_sites(profiles)
+        t_noop = time.perf_counter() - t0
+        print('{:<22} {:.3f} s'.format('batch, nothing new:', t_noop))
+        os.chdir(REPO_DIR)
+
+
+if __name__ == '__main__':
+    main()
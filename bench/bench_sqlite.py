@@ -0,0 +1,65 @@
+import argparse
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from _common import load_script, timeit
+from doge_diff import change_log, row_keys
+from doge_store import CsvStore, SqliteStore
+from grant_filters import UH_PROFILE, GrantIndex
+from stub_server import grant_records
+
+IDENTITY_COLUMNS = ['date', 'agency', 'recipient', 'value']
+
+
+def bench_select(scrape, site_generator, stub_df, tmp_dir):
+    # The UH site's rows: the whole stub CSV loaded and indexed, against one query
+    CsvStore(tmp_dir).save(site_generator.STUB_NAME, stub_df)
+    sql_store = SqliteStore(tmp_dir, export_csv=False)
+    sql_store.save(site_generator.STUB_NAME, stub_df)
+    csv_path = os.path.join(tmp_dir, site_generator.STUB_NAME + '.csv')
+    t_csv, csv_rows = timeit(lambda: GrantIndex(site_generator.load_grants(csv_path)).filter(UH_PROFILE))
+    t_sql, sql_rows = timeit(lambda: site_generator.grant_rows(csv_path, sql_store).filter(UH_PROFILE))
+    pd.testing.assert_frame_equal(csv_rows, sql_rows)
+    return t_csv, t_sql, len(sql_rows)
+
+
+def bench_changes(scrape, stub_df, edit_frac):
+    # A run where edit_frac of the grants had their savings revised
+    new_stub_df = stub_df.copy()
+    n_edit = int(len(stub_df) * edit_frac)
+    new_stub_df.loc[new_stub_df.index[:n_edit], 'savings'] += 1
+    keys = row_keys(stub_df, 'link', IDENTITY_COLUMNS)
+    new_keys = row_keys(new_stub_df, 'link', IDENTITY_COLUMNS)
+    t_log, changes_df = timeit(change_log, stub_df, new_stub_df, keys, new_keys, stub_df.columns)
+    new_df, _ = scrape.df_row_diff_2(stub_df, new_stub_df)
+    return t_log, len(changes_df.to_csv(index=False)), len(new_df.to_csv(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Site row selection from the stub CSV against SQLite, and change log size against row appends')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20000, 100000], help='number of grants')
+    parser.add_argument('--edit-frac', type=float, default=0.01, help='share of grants with revised savings')
+    args = parser.parse_args()
+
+    scrape = load_script('doge-scrape.py')
+    site_generator = load_script('site_generator.py')
+    print('{:>7} {:>9} {:>9} {:>6} {:>9} {:>12} {:>12}'.format(
+        'grants', 'csv s', 'sqlite s', 'uh', 'log s', 'log KB', 'rows KB'))
+    for n_grants in args.sizes:
+        stub_df = scrape.records_to_stub(grant_records(n_grants))
+        tmp_dir = tempfile.mkdtemp(prefix='doge-sqlite-')
+        try:
+            t_csv, t_sql, n_uh = bench_select(scrape, site_generator, stub_df, tmp_dir)
+        finally:
+            shutil.rmtree(tmp_dir)
+        t_log, log_bytes, rows_bytes = bench_changes(scrape, stub_df, args.edit_frac)
+        print('{:>7} {:>9.3f} {:>9.3f} {:>6} {:>9.3f} {:>12.1f} {:>12.1f}'.format(
+            n_grants, t_csv, t_sql, n_uh, t_log, log_bytes / 1024, rows_bytes / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import REPO_DIR, load_script
+from stub_server import grant_records
+
+CLI = os.path.join(REPO_DIR, 'doge.py')
+# Packages worth seeing in (or out of) a subcommand's imports
+HEAVY = ['pandas', 'numpy', 'pyarrow', 'requests', 'tqdm', 'validators', 'jinja2', 'flask', 'bs4', 'ratelimit']
+
+
+def make_inputs(tmp_dir, n_grants):
+    # A stub for render and two stubs a few rows apart for diff
+    stub_df = load_script('doge-scrape.py').records_to_stub(grant_records(n_grants))
+    os.makedirs(os.path.join(tmp_dir, 'data'))
+    stub_df.to_csv(os.path.join(tmp_dir, 'data', 'doge-grant-stub.csv'), index=False)
+    old_df = stub_df.iloc[10:].copy()
+    old_df.loc[old_df.index[:10], 'savings'] += 1
+    old_df.to_csv(os.path.join(tmp_dir, 'old.csv'), index=False)
+    stub_df.to_csv(os.path.join(tmp_dir, 'new.csv'), index=False)
+
+
+def run(argv, cwd):
+    # Wall time, total import time and the packages imported by one fresh interpreter
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, '-X', 'importtime'] + argv, cwd=cwd, env=env, check=True,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - t0
+    import_us, modules = 0, set()
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        import_us += int(self_us)
+        modules.add(name.strip())
+    return wall, import_us / 1e6, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Start-up time and imports of each doge.py subcommand')
+    parser.add_argument('--grants', type=int, default=2000, help='rows in the render and diff inputs')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    cases = [
+        ('--help', [CLI, '--help']),
+        ('scrape (load)', ['-c', 'import doge; doge.load_scrape()']),
+        ('enrich (no rows)', [CLI, 'enrich', '--table', 'doge-bench-none']),
+        ('diff', [CLI, 'diff', 'new.csv', '--old', 'old.csv']),
+        ('render uh', [CLI, 'render', 'uh', '--full']),
+        ('bench (list)', [CLI, 'bench']),
+    ]
+    tmp_dir = tempfile.mkdtemp(prefix='doge-startup-')
+    try:
+        make_inputs(tmp_dir, args.grants)
+        print('{:<18} {:>7} {:>9} {:>8}  {}'.format('subcommand', 'wall s', 'import s', 'modules', 'packages'))
+        for label, argv in cases:
+            runs = [run(argv, tmp_dir) for _ in range(args.repeat)]
+            wall, import_s, modules = min(runs, key=lambda r: r[0])
+            packages = [p for p in HEAVY if p in modules]
+            print('{:<18} {:>7.3f} {:>9.3f} {:>8}  {}'.format(
+                label, wall, import_s, len(modules), ' '.join(packages) or '-'))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
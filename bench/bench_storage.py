@@ -0,0 +1,39 @@
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+
+from _common import REPO_DIR, timeit
+from doge_store import CsvStore, ParquetStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare CSV and Parquet load time and size')
+    parser.add_argument('files', nargs='*', help='CSV tables (default: data/*.csv and the .old grant snapshot)')
+    args = parser.parse_args()
+    files = args.files or sorted(glob.glob(os.path.join(REPO_DIR, 'data', '*.csv'))) + \
+        [os.path.join(REPO_DIR, '.old', 'data3', 'doge-grant.csv')]
+
+    tmp_dir = tempfile.mkdtemp(prefix='doge-store-')
+    try:
+        print('{:<26} {:>7} {:>10} {:>10} {:>9} {:>9}'.format(
+            'table', 'rows', 'csv KB', 'pq KB', 'csv load', 'pq load'))
+        for path in files:
+            name = os.path.splitext(os.path.basename(path))[0]
+            shutil.copy(path, tmp_dir)
+            csv_store = CsvStore(tmp_dir)
+            pq_store = ParquetStore(tmp_dir, export_csv=False)
+            t_csv, df = timeit(csv_store.load, name)
+            pq_store.save(name, df)
+            t_pq, pq_df = timeit(pq_store.load, name)
+            assert pq_df.shape == df.shape
+            print('{:<26} {:>7} {:>10.0f} {:>10.0f} {:>8.3f}s {:>8.3f}s'.format(
+                name, len(df), os.path.getsize(csv_store.path(name)) / 1024,
+                os.path.getsize(pq_store.path(name)) / 1024, t_csv, t_pq))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import shutil
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from _common import timeit
+from doge_store import CsvStore, csv_text, whole_columns
+
+N_USAS_COLUMNS = 150
+
+
+def make_table(n_rows, seed=0):
+    # A grant history as wide as the one extend_grant_data builds
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'date': pd.Timestamp('2025-01-20') + pd.to_timedelta(rng.integers(0, 200, n_rows), unit='D'),
+        'value': rng.uniform(0, 1e7, n_rows).round(2),
+        'link': ['https://www.usaspending.gov/award/ASST_NON_{:08d}'.format(i) for i in range(n_rows)],
+        'description_doge': ['Description of grant {} '.format(i) * 4 for i in range(n_rows)],
+    })
+    usas_df = pd.DataFrame({'usas_field_{}'.format(j): rng.integers(0, 1000, n_rows).astype(str)
+                            for j in range(N_USAS_COLUMNS)}, index=df.index)
+    return pd.concat([df, usas_df], axis=1)
+
+
+def check_number_format(store):
+    # Rows appended or rewritten keep the stored table's number format,
+    # whatever the values of the new batch
+    history = pd.DataFrame({'value': [9475685.0, 0.5], 'sq_ft': [1200.0, 800.0]})
+    store.save('history', history)
+    store.append_rows('history', pd.DataFrame({'value': [0.0, 12345.0], 'sq_ft': [305298.0, 10.5]}))
+    with open(store.path('history'), encoding='utf-8') as f:
+        assert f.read() == 'value,sq_ft\n9475685.0,1200\n0.5,800\n0.0,305298\n12345.0,10.5\n', 'append format'
+    store.save('history', pd.DataFrame({'value': [100.0], 'sq_ft': [7.0]}))
+    with open(store.path('history'), encoding='utf-8') as f:
+        assert f.read() == 'value,sq_ft\n100.0,7\n', 'rewrite format'
+
+
+def peak_mb(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time and peak memory of writing a table with to_csv against the atomic, chunked CsvStore.save')
+    parser.add_argument('--rows', type=int, nargs='+', default=[20000, 100000])
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix='doge-write-')
+    try:
+        store = CsvStore(tmp_dir)
+        check_number_format(store)
+        print('{:>7} {:>9} {:>11} {:>11} {:>11} {:>11} {:>10}'.format(
+            'rows', 'MB', 'to_csv s', 'save s', 'to_csv MB', 'save MB', 'verify s'))
+        for n_rows in args.rows:
+            df = make_table(n_rows)
+            # The text the store writes, formatted up front so only the writers are timed
+            text_df = csv_text(df, whole_columns(df))
+            plain_path = os.path.join(tmp_dir, 'plain.csv')
+            t_plain, _ = timeit(text_df.to_csv, plain_path, index=False, repeat=1)
+            t_save, _ = timeit(store.save, 'table', df, repeat=1)
+            with open(plain_path, 'rb') as f1, open(store.path('table'), 'rb') as f2:
+                assert f1.read() == f2.read()
+            t_verify, _ = timeit(store.verify, 'table', repeat=1)
+            print('{:>7} {:>9.1f} {:>11.3f} {:>11.3f} {:>11.1f} {:>11.1f} {:>10.3f}'.format(
+                n_rows, os.path.getsize(plain_path) / 1024 ** 2, t_plain, t_save,
+                peak_mb(lambda: text_df.to_csv(plain_path, index=False)), peak_mb(lambda: store.save('table', df)),
+                t_verify))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from _common import REPO_DIR
+
+AWARD_RE = re.compile(r'/api/v2/awards/([^/?]+)/?$')
+SAVINGS_RE = re.compile(r'/savings/(\w+)/?$')
+
+
+def canned_award(award_id):
+    # Shaped like a USASpending award: a few nested blocks that json_normalize flattens
+    return {
+        'id': abs(hash(award_id)) % 10 ** 8,
+        'generated_unique_award_id': award_id,
+        'category': 'grant',
+        'type_description': 'PROJECT GRANT (B)',
+        'description': 'Canned award {}'.format(award_id),
+        'total_obligation': 125000.0,
+        'recipient': {
+            'recipient_name': 'UNIVERSITY OF HAWAII',
+            'location': {'state_code': 'HI', 'city_name': 'HONOLULU'},
+        },
+        'awarding_agency': {'toptier_agency': {'name': 'National Science Foundation'}},
+        'period_of_performance': {'start_date': '2023-09-01', 'end_date': '2026-08-31'},
+    }
+
+
+def to_records(df):
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+def _resample(df, n, seed):
+    return df.sample(n=n, replace=n > len(df), random_state=seed).reset_index(drop=True)
+
+
+def grant_records(n, seed=0):
+    """n grants shaped like api.doge.gov/savings/grants, newest first.
+
+    Agencies, amounts, descriptions and dates come from the old grant
+    snapshot, recipients from the shipped contract vendors, and every grant
+    gets its own USASpending award link.
+    """
+    rng = np.random.default_rng(seed)
+    snapshot = pd.read_csv(os.path.join(REPO_DIR, '.old', 'data3', 'doge-grant.csv'))
+    snapshot['uploaded_dt'] = pd.to_datetime(snapshot['uploaded_on'], errors='coerce', format='mixed')
+    snapshot = _resample(snapshot.dropna(subset=['uploaded_dt', 'value']), n, seed)
+    vendors = pd.read_csv(os.path.join(REPO_DIR, 'data', 'doge-contract-stub.csv'))['vendor'].dropna()
+    recipients = _resample(vendors.to_frame(), n, seed + 1)['vendor']
+    # Enough University of Hawaii grants for the UH page to have rows
+    recipients[rng.random(n) < 0.02] = 'Research Corporation of the University of Hawaii'
+    dates = snapshot['uploaded_dt']
+    df = pd.DataFrame({
+        'date': dates.dt.month.astype(str) + '/' + dates.dt.day.astype(str) + '/' + dates.dt.year.astype(str),
+        'agency': snapshot['agency'],
+        'recipient': recipients,
+        'value': snapshot['value'],
+        'savings': (snapshot['value'] * rng.random(n)).round(2),
+        'link': ['https://www.usaspending.gov/award/ASST_NON_{:07d}_4900'.format(i) for i in range(n)],
+        'description': snapshot['description'],
+    })
+    df = df.iloc[np.argsort(-dates.values.astype('int64'), kind='stable')]
+    return to_records(df)
+
+
+def _newest_first(df, date_column):
+    # As the API lists them with sort_by=date&sort_order=desc
+    dates = pd.to_datetime(df[date_column], errors='coerce', format='mixed')
+    df = df.iloc[np.argsort(-dates.values.astype('int64'), kind='stable')]
+    return df.rename(columns={'description_doge': 'description'})
+
+
+def shipped_datasets(n_grants, n_contracts=None, n_leases=None, seed=0):
+    """Records for every DOGE endpoint, resampled from the shipped data/ stubs."""
+    contracts = pd.read_csv(os.path.join(REPO_DIR, 'data', 'doge-contract-stub.csv'))
+    leases = pd.read_csv(os.path.join(REPO_DIR, 'data', 'doge-property-stub.csv')).drop(columns=['city', 'state'])
+    return {
+        'grants': grant_records(n_grants, seed),
+        'contracts': to_records(_newest_first(_resample(contracts, n_contracts or len(contracts), seed),
+                                              'deleted_date')),
+        'leases': to_records(_newest_first(_resample(leases, n_leases or len(leases), seed), 'date')),
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.count_request()
+        time.sleep(server.latency_s)
+        if random.random() < server.error_rate:
+            return self._send(503, {'detail': 'injected error'})
+        path = urlsplit(self.path).path
+        m = SAVINGS_RE.search(path)
+        if m is not None and m.group(1) in server.datasets:
+            payload = self._savings_page(m.group(1))
+            etag = '"{}"'.format(hashlib.sha1(json.dumps(payload).encode()).hexdigest())
+            if self.headers.get('If-None-Match') == etag:
+                return self._send(304, None, etag)
+            return self._send(200, payload, etag)
+        m = AWARD_RE.search(path)
+        if m is None:
+            return self._send(404, {'detail': 'not found'})
+        self._send(200, canned_award(m.group(1)))
+
+    def _savings_page(self, endpoint_str):
+        # Mimics api.doge.gov/savings/<endpoint>: records under result, page count under meta
+        query = parse_qs(urlsplit(self.path).query)
+        page = int(query.get('page', ['1'])[0])
+        per_page = int(query.get('per_page', ['100'])[0])
+        records = self.server.datasets[endpoint_str]
+        return {
+            'success': True,
+            'result': {endpoint_str: records[(page - 1) * per_page:page * per_page]},
+            'meta': {'total_results': len(records), 'pages': max(1, math.ceil(len(records) / per_page))},
+        }
+
+    def _send(self, status, payload, etag=None):
+        body = json.dumps(payload).encode() if payload is not None else b''
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency_s=0.0, error_rate=0.0, datasets=None, port=0):
+        super().__init__(('127.0.0.1', port), StubHandler)
+        self.datasets = datasets or {}
+        self.latency_s = latency_s
+        self.error_rate = error_rate
+        self.n_requests = 0
+        self._count_lock = threading.Lock()
+
+    def count_request(self):
+        with self._count_lock:
+            self.n_requests += 1
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -1,159 +1,436 @@
+import json
 import os
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
 
 import numpy as np
 import pandas as pd
 import requests as req
-import validators
-from bs4 import BeautifulSoup
-from ratelimit import limits, sleep_and_retry
-from tqdm import tqdm
+
+from doge_cache import AwardCache, EnrichJournal
+from doge_diff import (ADDED, CHANGED, DELETED, KEY_COLUMNS, MODIFIED, NEW, UNCHANGED, HistoryIndex, award_ids,
+                       diff_rows, row_fingerprints, row_keys, stub_changes)
+from doge_enrich import (LIMIT_S, N_REQ, SKIPPED, USAS_API_ROOT, award_url, awards_to_frame, fetch_awards,
+                         fpds_links_to_frame)
+from doge_fetch import DOGE_API_ROOT, N_PAGE_WORKERS, fetch_new_pages, fetch_pages, make_session
+from doge_report import RunReport
+from doge_store import DATASET_TABLES, GRANT_SCHEMA, PartitionedHistory, apply_schema, atomic_write, get_store
 
 # Set up absolute path to data directory
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(SCRIPT_DIR, 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
 
-N_REQ = 10
-LIMIT_S = 3
+STORE = get_store(DATA_DIR)
+# DOGE_HISTORY=partitioned keeps each table as one partition per run, e.g. under data/doge-grant/
+HISTORY = PartitionedHistory(DATA_DIR) if os.environ.get('DOGE_HISTORY') == 'partitioned' else None
+COMPACT_AFTER = int(os.environ.get('DOGE_COMPACT_AFTER', 0))
+# DOGE_STREAM=1 diffs against the history chunk by chunk instead of loading it whole
+STREAM = os.environ.get('DOGE_STREAM') == '1'
+# DOGE_INCREMENTAL=1 stops paginating at the first page already in the stub,
+# with a full scrape every DOGE_FULL_EVERY_DAYS days to catch retroactive edits
+INCREMENTAL = os.environ.get('DOGE_INCREMENTAL') == '1'
+FULL_EVERY_DAYS = float(os.environ.get('DOGE_FULL_EVERY_DAYS', 7))
+SCRAPE_STATE = 'doge-scrape-state.json'
+# DOGE_DATASETS=grants,contracts limits a run to some of the DATASETS endpoints
+DOGE_DATASETS = os.environ.get('DOGE_DATASETS', 'grants,contracts,leases').split(',')
+# Pages in flight at once across all endpoints scraped together
+N_SCRAPE_WORKERS = 8
+DOGE_PARAMS = {
+    "sort_by": "date",
+    "sort_order": "desc",
+    "per_page": 500
+}
+
+CACHE_DIR = os.path.join(SCRIPT_DIR, '.cache', 'usas')
+AWARD_CACHE = AwardCache(CACHE_DIR)
+# Lookups of the current enrichment, replayed by the next run if this one dies
+ENRICH_JOURNAL = EnrichJournal(os.path.join(CACHE_DIR, 'journal.jsonl'))
+# DOGE_ENRICH_BUDGET_S stops requesting awards after that many seconds; the
+# grants left over are not saved, so the next run picks them up as new
+ENRICH_BUDGET_S = float(os.environ.get('DOGE_ENRICH_BUDGET_S', 0)) or None
+# DOGE_NORMALIZE_WORKERS=N flattens award JSON in N processes; DOGE_USAS_FIELDS=a,b,...
+# keeps only those flattened USASpending fields (e.g. id,recipient_recipient_name)
+N_NORMALIZE_WORKERS = int(os.environ.get('DOGE_NORMALIZE_WORKERS', 1))
+USAS_FIELDS = os.environ.get('DOGE_USAS_FIELDS', '').split(',') if os.environ.get('DOGE_USAS_FIELDS') else None
 
 # --- Only needed for grant extension ---
-def extend_grant_data(grant_df, dt):
-    api_root = 'https://api.usaspending.gov/api/v2/awards/'
-    usas_df = pd.DataFrame([])
+def extend_grant_data(grant_df, dt, api_root=USAS_API_ROOT, journal=True):
+    # Keeps grant_df's labels; grants left when ENRICH_BUDGET_S runs out are dropped
+    import validators
     rh = req.utils.default_headers()
-    for link in tqdm(grant_df.link.values):
-        if validators.url(link):
-            try:
-                grant_id = os.path.basename(link)
-                usas_req_url = os.path.join(api_root, grant_id)
-                r = limit_req(usas_req_url, headers=rh)
-                grant_row_df = pd.json_normalize(r.json(), sep='_')
-                grant_row_df = grant_row_df.rename(columns={'description': 'description_usas'})
-                usas_df = pd.concat([usas_df, grant_row_df], ignore_index=True)
-            except:
-                usas_df = pd.concat([usas_df, pd.DataFrame([], index=[0])], ignore_index=True)
-        else:
-            usas_df = pd.concat([usas_df, pd.DataFrame([], index=[0])], ignore_index=True)
-    return pd.concat([grant_df.reset_index().drop('index', axis=1), usas_df], axis=1)
-
-@sleep_and_retry
-@limits(calls=N_REQ, period=LIMIT_S)
-def limit_req(url, headers={}):
-    r = req.get(url, headers=headers)
-    if r.status_code != 200:
-        raise Exception('API response: {}'.format(r.status_code))
-    return r
-
-def safe_load_csv(filename):
-    filepath = os.path.join(DATA_DIR, filename)
-    if os.path.exists(filepath) and os.path.getsize(filepath) > 0:
-        try:
-            df = pd.read_csv(filepath)
-        except Exception as e:
-            print(f"Could not read {filepath}: {e}")
-            df = pd.DataFrame([])
-    else:
-        df = pd.DataFrame([])
-    if 'uploaded_dt' in df.keys():
-        df['uploaded_dt'] = pd.to_datetime(df['uploaded_dt'])
-    return df
+    award_ids = [os.path.basename(link) if validators.url(link) else None
+                 for link in grant_df.link.values]
+    # Without journal the lookups are only cached: no saved rows will follow to clear it
+    entries = ENRICH_JOURNAL.load() if journal else {}
+    resumed = [award_id in entries for award_id in award_ids]
+    if any(resumed):
+        print('resuming {} award lookups from {}'.format(sum(resumed), ENRICH_JOURNAL.path))
+    records = [entries[award_id].get('data') if done else AWARD_CACHE.get(award_id) if award_id else None
+               for award_id, done in zip(award_ids, resumed)]
+    miss_urls = [award_url(award_id, api_root) if award_id and rec is None and not done else None
+                 for award_id, rec, done in zip(award_ids, records, resumed)]
+    skipped = set()
+
+    def on_result(idx, rec, status):
+        if status == SKIPPED:
+            skipped.add(idx)
+        elif journal and (rec is not None or status is not None):
+            ENRICH_JOURNAL.add(award_ids[idx], rec, status)
+
+    with ENRICH_JOURNAL if journal else nullcontext():
+        fetched = fetch_awards(miss_urls, headers=rh, calls=N_REQ, period=LIMIT_S, on_result=on_result,
+                               budget_s=ENRICH_BUDGET_S)
+    for idx, rec in enumerate(fetched):
+        if rec is not None:
+            AWARD_CACHE.put(award_ids[idx], rec)
+            records[idx] = rec
+    AWARD_CACHE.prune()
+    if skipped:
+        print('enrichment budget spent: {} grants left for the next run'.format(len(skipped)))
+    keep = np.array([idx not in skipped for idx in range(len(records))], dtype=bool)
+    usas_df = awards_to_frame([rec for rec, k in zip(records, keep) if k], usas_columns(grant_df.columns),
+                              USAS_FIELDS, N_NORMALIZE_WORKERS)
+    grant_df = grant_df[keep]
+    return pd.concat([grant_df, usas_df.set_axis(grant_df.index)], axis=1)
+
+def usas_columns(stub_columns, table='doge-grant'):
+    # The USASpending fields earlier runs stored, in the stored order, from the header alone
+    if HISTORY is not None or not STORE.exists(table):
+        return []
+    return [c for c in STORE.columns(table) if c not in set(stub_columns) and c != 'dt_scrape']
 
-def clean_pre_df(df):
-    return df.fillna('')
-
-def load_pre_data():
-    pre_grant_df = safe_load_csv('doge-grant.csv')
-    pre_grant_df = clean_pre_df(pre_grant_df)
-    return pre_grant_df
-
-def scrape_doge_endpoint(api_root, endpoint_str, params):
-    endpoint_json_list = []
-    p_scrape = True
-    page = 1
-    while p_scrape:
-        r = req.get(os.path.join(api_root, endpoint_str), params={**params, "page": page})
-        _json_list = r.json()['result'][endpoint_str]
-        p_scrape = page < r.json()['meta']['pages']
-        endpoint_json_list.extend(_json_list)
-        page += 1
+def extend_contract_data(contract_df, dt):
+    # FPDS pages are not fetched; the award ids in the link are enough to join on
+    fpds_df = fpds_links_to_frame(contract_df.fpds_link.values)
+    return pd.concat([contract_df, fpds_df.set_axis(contract_df.index)], axis=1)
+
+def safe_load_csv(filename, columns=None):
+    name = os.path.splitext(filename)[0]
+    if not STORE.exists(name):
+        return pd.DataFrame([])
+    # A damaged table stops the run: read as empty, every row in it would
+    # be diffed as new and sent to USASpending again
+    STORE.verify(name)
+    return STORE.load(name, columns=columns)
+
+def load_pre_data(table='doge-grant', columns=None):
+    # Typed by the table's schema and left with its missing values: filling
+    # them with '' would turn every column, amounts included, into objects.
+    # Pass the stub's columns to leave the wide USASpending ones on disk.
+    if HISTORY is not None:
+        HISTORY.verify(table)
+        return HISTORY.load(table, columns=columns)
+    return safe_load_csv(table + '.csv', columns)
+
+def iter_pre_chunks(columns=None, table='doge-grant'):
+    if HISTORY is not None:
+        HISTORY.verify(table)
+        return HISTORY.iter_chunks(table, columns)
+    if STORE.exists(table):
+        STORE.verify(table)
+        return STORE.iter_chunks(table, columns)
+    return iter([])
+
+def load_pre_index(columns, table='doge-grant', key_columns=KEY_COLUMNS):
+    return HistoryIndex.from_chunks(iter_pre_chunks(columns, table), columns, key_columns)
+
+def scrape_doge_endpoint(api_root, endpoint_str, params, n_workers=N_PAGE_WORKERS, session=None, pool=None):
+    endpoint_json_list = fetch_pages(api_root, endpoint_str, params, n_workers=n_workers,
+                                     session=session, pool=pool)
     df = pd.DataFrame(endpoint_json_list)
     df = df.rename(columns={'description': 'description_doge'})
     return df
 
-def scrape_doge():
-    api_root = 'https://api.doge.gov/savings/'
-    params = {
-        "sort_by": "date",
-        "sort_order": "desc",
-        "per_page": 500
-    }
-    grant_df = scrape_doge_endpoint(api_root, 'grants', params)
-    return grant_df
-
-def safe_to_dt(dtstr):
+def scrape_doge(api_root=DOGE_API_ROOT, endpoint_str='grants', session=None, pool=None):
+    return scrape_doge_endpoint(api_root, endpoint_str, DOGE_PARAMS, session=session, pool=pool)
+
+def load_scrape_state():
+    # {endpoint: {'last_full': ..., 'validators': {...}}}
     try:
-        dt = pd.to_datetime(dtstr)
-    except:
-        dt = None
-    return dt
+        with open(os.path.join(DATA_DIR, SCRAPE_STATE), encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # Earlier runs only scraped grants and kept one unkeyed state
+    if 'validators' in state:
+        state = {'grants': state}
+    return state
+
+def save_scrape_state(endpoint_str, endpoint_state):
+    state = load_scrape_state()
+    state[endpoint_str] = endpoint_state
+    with atomic_write(os.path.join(DATA_DIR, SCRAPE_STATE)) as f:
+        json.dump(state, f, indent=1)
+
+def needs_full_scrape(state, now):
+    last_full = state.get('last_full')
+    return last_full is None or now - datetime.fromisoformat(last_full) > timedelta(days=FULL_EVERY_DAYS)
 
-def df_row_diff_2(old_df, stub_df):
+def records_to_stub(records, schema=GRANT_SCHEMA):
+    df = pd.DataFrame(records).rename(columns={'description': 'description_doge'})
+    return apply_schema(clean_stub_df(df), schema)
+
+def scrape_doge_incremental(prev_stub_df, state, api_root=DOGE_API_ROOT, endpoint_str='grants',
+                            session=None, pool=None):
+    """Scrape an endpoint newest first until a page is already in prev_stub_df.
+
+    The stub is rebuilt from the pages read plus the rows of prev_stub_df
+    dated no later than the oldest row read that were not read again; rows
+    dated after it and missing from the pages were deleted upstream. Returns
+    the stub and the scrape state to save with it, or (None, state) when the
+    stub cannot be rebuilt and a full scrape is needed.
+    """
+    dataset = DATASETS[endpoint_str]
+    date_col, key_col = dataset['date_column'], dataset['key_column']
+    validators = dict(state.get('validators', {}))
+    columns = list(prev_stub_df.columns)
+    known_fps = set(row_fingerprints(prev_stub_df, columns))
+
+    def is_known(records):
+        page_df = records_to_stub(records, dataset['schema'])
+        if set(page_df.columns) != set(columns):
+            return False
+        return row_fingerprints(page_df, columns).isin(known_fps).all()
+
+    records, stopped = fetch_new_pages(api_root, endpoint_str, DOGE_PARAMS, is_known, validators,
+                                       session=session, pool=pool)
+    new_state = dict(state, validators=validators)
+    if records is None:
+        print('{} not modified since the last scrape'.format(endpoint_str))
+        return prev_stub_df, new_state
+    read_df = records_to_stub(records, dataset['schema'])
+    if not stopped:
+        return read_df, new_state
+    if set(read_df.columns) != set(columns) or date_col not in columns or read_df[date_col].isna().all():
+        return None, state
+    if not read_df[date_col].dropna().is_monotonic_decreasing:
+        print('{} are not listed newest first, cannot stop early'.format(endpoint_str))
+        return None, state
+    boundary = read_df[date_col].min()
+    prev_fps = row_fingerprints(prev_stub_df, columns)
+    prev_dates = prev_stub_df[date_col]
+    older = (prev_dates <= boundary) | prev_dates.isna()
+    # A row read again replaces its old row, copy for copy since the listing
+    # has exact duplicates. At the boundary date, where the old row may sit on
+    # either side of the stop, an edited one is matched by its key, as long as
+    # no other row shares it (placeholder links like https://fpds.gov do).
+    read_fps = row_fingerprints(read_df, columns)
+    reread = prev_fps.groupby(prev_fps).cumcount() < prev_fps.map(read_fps.value_counts()).fillna(0)
+    if key_col in columns:
+        keys = prev_stub_df[key_col]
+        edited = (prev_dates == boundary) & ~prev_fps.isin(set(read_fps))
+        edited &= keys.notna() & (keys != '') & ~keys.duplicated(keep=False)
+        reread |= edited & keys.isin(set(read_df[key_col]))
+    tail_df = prev_stub_df[older & ~reread]
+    print('read {} {}, kept {} older rows from the last scrape'.format(len(read_df), endpoint_str, len(tail_df)))
+    stub_df = pd.concat([read_df, tail_df[read_df.columns]], ignore_index=True)
+    return apply_schema(stub_df, dataset['schema']), new_state
+
+def scrape_dataset(endpoint_str, api_root=DOGE_API_ROOT, session=None, pool=None):
+    """Full or incremental scrape of one endpoint; returns the stub and the state to save after it."""
+    if not INCREMENTAL:
+        return scrape_doge(api_root, endpoint_str, session, pool), None
+    now = datetime.now()
+    state = load_scrape_state().get(endpoint_str, {})
+    prev_stub_df = safe_load_csv(DATASETS[endpoint_str]['table'] + '-stub.csv')
+    if not needs_full_scrape(state, now) and len(prev_stub_df):
+        stub_df, new_state = scrape_doge_incremental(prev_stub_df, state, api_root, endpoint_str, session, pool)
+        if stub_df is not None:
+            return stub_df, new_state
+    print('full scrape of {} to reconcile the stub with the API'.format(endpoint_str))
+    stub_df = scrape_doge(api_root, endpoint_str, session, pool)
+    return stub_df, dict(state, last_full=now.isoformat(timespec='seconds'), validators={})
+
+def scrape_datasets(endpoints, api_root=DOGE_API_ROOT, n_workers=N_SCRAPE_WORKERS):
+    """Scrape endpoints concurrently on one session and one pool of n_workers page fetchers.
+
+    Returns {endpoint: (stub_df, scrape_state, seconds)}.
+    """
+    def run(endpoint_str):
+        t0 = time.perf_counter()
+        stub_df, scrape_state = scrape_dataset(endpoint_str, api_root, session, page_pool)
+        return stub_df, scrape_state, time.perf_counter() - t0
+
+    with make_session(n_workers + len(endpoints)) as session, ThreadPoolExecutor(n_workers) as page_pool, \
+            ThreadPoolExecutor(len(endpoints)) as endpoint_pool:
+        futures = {endpoint_str: endpoint_pool.submit(run, endpoint_str) for endpoint_str in endpoints}
+        return {endpoint_str: future.result() for endpoint_str, future in futures.items()}
+
+def df_row_diff_2(old_df, stub_df, key_columns=KEY_COLUMNS):
+    # old_df is either the history frame or a HistoryIndex built from it
+    old_columns = old_df.seen_columns if isinstance(old_df, HistoryIndex) else old_df.columns
     # If columns mismatch, skip and return stub_df (all as new)
-    if set(stub_df.columns) - set(old_df.columns):
+    if set(stub_df.columns) - set(old_columns):
         print("WARNING: Column mismatch detected. All rows in stub_df will be considered new.")
-        print("old_df columns:", list(old_df.columns))
+        print("old_df columns:", list(old_columns))
         print("stub_df columns:", list(stub_df.columns))
         return stub_df.copy(), []
-    new_df = stub_df.copy()
-    drop_idx = []
-    for idx, row in tqdm(new_df.iterrows()):
-        match_series = (old_df[stub_df.columns] == row).all(axis=1)
-        if match_series.any():
-            drop_idx.append(np.arange(len(match_series))[match_series])
-            new_df = new_df.drop(idx, axis=0)
+    new_df, drop_idx, status = diff_rows(old_df, stub_df, key_columns)
+    print('{} new, {} changed, {} unchanged'.format(
+        (status == NEW).sum(), (status == CHANGED).sum(), (status == UNCHANGED).sum()))
     return new_df, drop_idx
 
 def clean_stub_df(df):
     df.columns = [k.lower().replace(' ', '_') for k in df.keys()]
     if 'uploaded_on' in df.keys():
-        df['uploaded_dt'] = [safe_to_dt(dts) for dts in df['uploaded_on'].values]
+        df['uploaded_dt'] = pd.to_datetime(df['uploaded_on'], errors='coerce', format='mixed')
     if 'location' in df.keys():
-        loc_part_list = [loc.split(', ') for loc in df['location'].values]
-        for idx, loc_part_tup in enumerate(loc_part_list):
-            city_pred = len(loc_part_tup[1]) == 2
-            df.loc[idx, 'city'] = loc_part_tup[0]
-            df.loc[idx, 'state'] = loc_part_tup[1] if city_pred else ''
-            if len(loc_part_tup) > 2:
-                df.loc[idx, 'agency'] = loc_part_tup[2] if city_pred else loc_part_tup[1]
+        # "CITY, ST, AGENCY" or "CITY, AGENCY"; pad so parts 1 and 2 always exist
+        loc_parts = df['location'].str.split(', ', expand=True)
+        loc_parts = loc_parts.reindex(columns=range(max(3, loc_parts.shape[1])))
+        city_pred = loc_parts[1].str.len() == 2
+        df['city'] = loc_parts[0]
+        df['state'] = loc_parts[1].where(city_pred, '')
+        has_agency = loc_parts[2].notna()
+        if has_agency.any():
+            loc_agency = loc_parts[2].where(city_pred, loc_parts[1])
+            old_agency = df['agency'] if 'agency' in df.keys() else np.nan
+            df['agency'] = loc_agency.where(has_agency, old_agency)
     if 'link' in df.keys():
         df.link = df.link.fillna('')
     if 'vendor' in df.keys():
-        df.loc[df.vendor == 'N/A', 'vendor'] = ''
+        vendor = df['vendor'].astype(object)
+        df['vendor'] = vendor.where(vendor != 'N/A', '')
     return df
 
-def save_doge_data(grant_df, stub_grant_df):
-    grant_df.to_csv(os.path.join(DATA_DIR, 'doge-grant.csv'), index=False)
-    stub_grant_df.to_csv(os.path.join(DATA_DIR, 'doge-grant-stub.csv'), index=False)
+def save_doge_data(new_df, stub_df, scrape_state=None, endpoint_str='grants', keys=None, changes_df=None):
+    # The history only grows, and the run never loaded its USASpending
+    # columns, so new rows are appended rather than the table rewritten
+    dataset = DATASETS[endpoint_str]
+    table = dataset['table']
+    if HISTORY is not None:
+        # Only this run's rows are written; older partitions are left untouched
+        HISTORY.append(table, new_df)
+        if COMPACT_AFTER and len(HISTORY.partitions(table)) > COMPACT_AFTER:
+            HISTORY.compact(table)
+    else:
+        # A SqliteStore replaces the stored row of each key; the CSV keeps every version
+        STORE.append_rows(table, new_df, keys, key_rows=lambda df: row_keys(
+            df, dataset['key_column'], dataset['identity_columns']))
+    if changes_df is not None and len(changes_df):
+        STORE.append_rows(table + '-changes', changes_df)
+    STORE.save(table + '-stub', stub_df)
+    # Saved last, so validators never describe a stub that was not written
+    if scrape_state is not None:
+        save_scrape_state(endpoint_str, scrape_state)
+
+# The stored tables of DATASET_TABLES in doge_store, and how each endpoint's new rows are extended
+DATASETS = {
+    'grants': dict(DATASET_TABLES['grants'], enrich=extend_grant_data),
+    'contracts': dict(DATASET_TABLES['contracts'], enrich=extend_contract_data),
+    'leases': dict(DATASET_TABLES['leases'], enrich=None),
+}
+
+def reuse_enrichment(new_df, table, key_col, stub_columns, known):
+    """Fill rows already stored under the same award id with their stored enrichment.
+
+    Only ids in `known`, those of the previous stub, are looked up, so a run
+    with no edited rows does not read the history. Returns the filled rows
+    and the rows still to enrich.
+    """
+    if not key_col or not len(new_df):
+        return new_df.iloc[:0], new_df
+    has_id = award_ids(new_df[key_col]).notna().to_numpy()
+    values = np.intersect1d(new_df.loc[has_id, key_col].astype(str).unique(), np.asarray(known, dtype=str))
+    if not len(values):
+        return new_df.iloc[:0], new_df
+    prior = (HISTORY or STORE).load_matching(table, key_col, values)
+    extra = [c for c in prior.columns if c not in stub_columns and c != 'dt_scrape']
+    if not extra:
+        return new_df.iloc[:0], new_df
+    prior = prior.set_index(prior[key_col].astype(str))[extra]
+    prior = prior[prior.notna().any(axis=1)]
+    reuse = has_id & new_df[key_col].astype(str).isin(prior.index).to_numpy()
+    reused_df = new_df[reuse].copy()
+    prior = prior.reindex(reused_df[key_col].astype(str)).set_axis(reused_df.index)
+    return pd.concat([reused_df, prior], axis=1), new_df[~reuse]
+
+def update_dataset(run, endpoint_str, stub_df, datetime_scrape):
+    """Clean, diff and extend one scraped stub.
+
+    Returns the rows to store with their keys, the stub and the field-level
+    change log against the previous stub.
+    """
+    dataset = DATASETS[endpoint_str]
+    key_col = dataset['key_column']
+    key_columns = [key_col] if key_col else []
+    with run.stage(endpoint_str + '.clean', rows_in=len(stub_df)) as stage:
+        stub_df = clean_stub_df(stub_df)
+        stub_df = apply_schema(stub_df, dataset['schema'])
+        stage['rows_out'] = len(stub_df)
+    with run.stage(endpoint_str + '.changes', rows_in=len(stub_df)) as stage:
+        prev_stub_df = safe_load_csv(dataset['table'] + '-stub.csv', stub_df.columns)
+        keys, changes_df = stub_changes(prev_stub_df, stub_df, key_col, dataset['identity_columns'], datetime_scrape)
+        if changes_df is not None:
+            counts = changes_df.drop_duplicates(['row_key', 'change'])['change'].value_counts()
+            stage.update({change: int(counts.get(change, 0)) for change in (ADDED, MODIFIED, DELETED)})
+    # Only the columns the diff compares are read from the history
+    print('loading current {}...'.format(endpoint_str))
+    with run.stage(endpoint_str + '.load') as stage:
+        if STREAM:
+            pre_df = load_pre_index(stub_df.columns, dataset['table'], key_columns)
+        else:
+            pre_df = load_pre_data(dataset['table'], stub_df.columns)
+            stage['memory_mb'] = round(pre_df.memory_usage(deep=True).sum() / 1024 ** 2, 1)
+        stage['rows_out'] = len(pre_df)
+    print('finding new and changed {}...'.format(endpoint_str))
+    with run.stage(endpoint_str + '.diff', rows_in=len(stub_df)) as stage:
+        new_df, drop_idx = df_row_diff_2(pre_df, stub_df, key_columns)
+        stage['rows_out'] = len(new_df)
+    if dataset['enrich'] is not None:
+        print('extending {} table...'.format(endpoint_str))
+        hits, misses = AWARD_CACHE.hits, AWARD_CACHE.misses
+        with run.stage(endpoint_str + '.enrich', rows_in=len(new_df)) as stage:
+            # Edited rows keep the enrichment stored for their award
+            known = prev_stub_df[key_col].dropna().astype(str).unique() if key_col in prev_stub_df else []
+            reused_df, todo_df = reuse_enrichment(new_df, dataset['table'], key_col, stub_df.columns, known)
+            stage['reused'] = len(reused_df)
+            if len(todo_df) or not len(reused_df):
+                todo_df = dataset['enrich'](todo_df, datetime_scrape)
+            # Back in stub order, without rows enrichment left for the next run
+            order = new_df.index
+            new_df = pd.concat([reused_df, todo_df])
+            new_df = new_df.loc[order[order.isin(new_df.index)]]
+            stage['rows_out'] = len(new_df)
+            if AWARD_CACHE.hits + AWARD_CACHE.misses > hits + misses:
+                stage.update(cache_hits=AWARD_CACHE.hits - hits, cache_misses=AWARD_CACHE.misses - misses)
+    new_keys = keys.loc[new_df.index].tolist()
+    new_df = new_df.reset_index(drop=True)
+    new_df['dt_scrape'] = datetime_scrape
+    return dict(new_df=new_df, stub_df=stub_df, keys=new_keys, changes_df=changes_df)
 
-def update_doge_data():
+def update_doge_data(run=None, endpoints=None):
+    """Scrape, diff and extend every dataset; returns {endpoint: save_doge_data keyword arguments}."""
+    run = RunReport() if run is None else run
+    endpoints = DOGE_DATASETS if endpoints is None else endpoints
     datetime_scrape = datetime.strftime(datetime.now(), '%Y-%m-%d-%H%M')
-    print('loading current data...')
-    pre_grant_df = load_pre_data()
+    run.info['dt_scrape'] = datetime_scrape
     print('scraping new data...')
-    stub_grant_df = scrape_doge()
-    stub_grant_df = clean_stub_df(stub_grant_df)
-    print('finding new and changed entries...')
-    new_grant_df, grant_drop_idx = df_row_diff_2(pre_grant_df, stub_grant_df)
-    print('extending grant table with USASpending data...')
-    new_grant_df = extend_grant_data(new_grant_df, datetime_scrape)
-    new_grant_df['dt_scrape'] = datetime_scrape
-    grant_df = pd.concat([pre_grant_df, new_grant_df], ignore_index=True)
-    return grant_df, stub_grant_df
+    with run.stage('scrape') as stage:
+        scraped = scrape_datasets(endpoints)
+        stage['rows_out'] = {endpoint_str: len(stub_df) for endpoint_str, (stub_df, _, _) in scraped.items()}
+        stage['seconds_by_endpoint'] = {endpoint_str: round(t, 3) for endpoint_str, (_, _, t) in scraped.items()}
+    updates = {}
+    for endpoint_str, (stub_df, scrape_state, _) in scraped.items():
+        updates[endpoint_str] = dict(update_dataset(run, endpoint_str, stub_df, datetime_scrape),
+                                     scrape_state=scrape_state)
+    return updates
 
 def main():
-    grant_df, stub_grant_df = update_doge_data()
-    save_doge_data(grant_df, stub_grant_df)
+    run = RunReport(storage=type(STORE).__name__, history='partitioned' if HISTORY is not None else 'single',
+                    stream=STREAM, datasets=DOGE_DATASETS)
+    for endpoint_str, update in update_doge_data(run).items():
+        with run.stage(endpoint_str + '.save', rows_in=len(update['new_df'])):
+            save_doge_data(endpoint_str=endpoint_str, **update)
+    # Every lookup journaled is in a saved row now
+    ENRICH_JOURNAL.clear()
+    AWARD_CACHE.report(calls=N_REQ, period=LIMIT_S)
+    run.print_summary()
+    # One JSON line per run next to the data, for graphing runs over time
+    run.save(DATA_DIR)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,165 @@
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+# Nothing but the standard library is imported until a subcommand runs, and
+# each subcommand imports only what it uses: render never loads requests,
+# diff never loads Jinja, and --help loads neither
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(SCRIPT_DIR, 'bench')
+DATA_DIR = os.path.join(SCRIPT_DIR, 'data')
+N_DIFF_SHOWN = 20
+
+
+def load_script(filename):
+    # doge-scrape.py is not importable by name, so load it from its path,
+    # once, as doge_scrape; it reads its DOGE_* settings from the environment as it loads
+    name = os.path.splitext(filename)[0].replace('-', '_')
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_scrape():
+    return load_script('doge-scrape.py')
+
+
+def scrape(args):
+    if args.datasets:
+        os.environ['DOGE_DATASETS'] = args.datasets
+    if args.incremental:
+        os.environ['DOGE_INCREMENTAL'] = '1'
+    if args.enrich_budget:
+        os.environ['DOGE_ENRICH_BUDGET_S'] = str(args.enrich_budget)
+    load_scrape().main()
+
+
+def enrich(args):
+    # Fills the USASpending cache for a stored grant table; the next scrape
+    # finds those awards cached. Nothing is journaled, as no rows are saved
+    # here that would clear the journal again
+    if args.enrich_budget:
+        os.environ['DOGE_ENRICH_BUDGET_S'] = str(args.enrich_budget)
+    doge_scrape = load_scrape()
+    grant_df = doge_scrape.safe_load_csv(args.table + '.csv')
+    if not len(grant_df):
+        print('no grants in {}'.format(args.table))
+        return
+    grant_df = doge_scrape.extend_grant_data(grant_df, None, journal=False)
+    doge_scrape.AWARD_CACHE.report(calls=doge_scrape.N_REQ, period=doge_scrape.LIMIT_S)
+    if args.out:
+        grant_df.to_csv(args.out, index=False)
+        print('wrote {} enriched grants to {}'.format(len(grant_df), args.out))
+
+
+def diff(args):
+    # The change log a scrape returning the `new` stub would append; stubs are
+    # read as the scrape writes them, so the scraper itself is not loaded
+    import pandas as pd
+    from doge_diff import ADDED, DELETED, MODIFIED, stub_changes
+    from doge_store import DATASET_TABLES, apply_schema, get_store, read_dtypes
+    dataset = DATASET_TABLES[args.dataset]
+
+    def read_stub(path):
+        return apply_schema(pd.read_csv(path, dtype=read_dtypes(dataset['schema'])), dataset['schema'])
+
+    stub_df = read_stub(args.new)
+    if args.old:
+        prev_stub_df = read_stub(args.old)
+    else:
+        store, name = get_store(DATA_DIR), dataset['table'] + '-stub'
+        prev_stub_df = pd.DataFrame([])
+        if store.exists(name):
+            store.verify(name)
+            prev_stub_df = store.load(name, columns=stub_df.columns)
+    datetime_scrape = datetime.strftime(datetime.now(), '%Y-%m-%d-%H%M')
+    _, changes_df = stub_changes(prev_stub_df, stub_df, dataset['key_column'], dataset['identity_columns'],
+                                 datetime_scrape)
+    if changes_df is None:
+        print('no previous {} stub to compare with'.format(args.dataset))
+        return
+    counts = changes_df.drop_duplicates(['row_key', 'change'])['change'].value_counts()
+    print('{} added, {} modified, {} deleted rows'.format(
+        *(int(counts.get(change, 0)) for change in (ADDED, MODIFIED, DELETED))))
+    if args.out:
+        changes_df.to_csv(args.out, index=False)
+        print('wrote {} changes to {}'.format(len(changes_df), args.out))
+    elif len(changes_df):
+        print(changes_df.drop(columns='dt_scrape').head(N_DIFF_SHOWN).to_string(index=False))
+        if len(changes_df) > N_DIFF_SHOWN:
+            print('... {} more (--out to write them all)'.format(len(changes_df) - N_DIFF_SHOWN))
+
+
+def render(args):
+    from site_generator import SITE_PROFILES, build_sites
+    unknown = [name for name in args.profiles if name not in SITE_PROFILES]
+    if unknown:
+        raise SystemExit('unknown site {}; choose from {}'.format(', '.join(unknown), ', '.join(SITE_PROFILES)))
+    names = args.profiles or list(SITE_PROFILES)
+    build_sites({name: SITE_PROFILES[name] for name in names}, full=args.full, workers=args.workers)
+
+
+def bench_names():
+    return sorted(f[len('bench_'):-len('.py')] for f in os.listdir(BENCH_DIR)
+                  if f.startswith('bench_') and f.endswith('.py'))
+
+
+def bench(args):
+    if not args.name:
+        print('benchmarks: {}'.format(', '.join(bench_names())))
+        return
+    if args.name not in bench_names():
+        raise SystemExit('unknown benchmark {}; choose from {}'.format(args.name, ', '.join(bench_names())))
+    return subprocess.call([sys.executable, os.path.join(BENCH_DIR, 'bench_{}.py'.format(args.name))] + args.args)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description='Scrape DOGE savings, enrich them from USASpending and build the sites')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('scrape', help='scrape, diff, enrich and save every dataset (what doge-scrape.py runs)')
+    p.add_argument('--datasets', help='comma separated endpoints, e.g. grants,contracts (DOGE_DATASETS)')
+    p.add_argument('--incremental', action='store_true', help='stop paginating at known pages (DOGE_INCREMENTAL)')
+    p.add_argument('--enrich-budget', type=float, help='seconds of USASpending requests (DOGE_ENRICH_BUDGET_S)')
+    p.set_defaults(func=scrape)
+
+    p = commands.add_parser('enrich', help='fetch the USASpending awards of a stored grant table into the cache')
+    p.add_argument('--table', default='doge-grant-stub', help='table under data/ (default: %(default)s)')
+    p.add_argument('--out', help='also write the enriched grants to this csv')
+    p.add_argument('--enrich-budget', type=float, help='seconds of USASpending requests (DOGE_ENRICH_BUDGET_S)')
+    p.set_defaults(func=enrich)
+
+    p = commands.add_parser('diff', help='field-level changes between two stubs of a dataset')
+    p.add_argument('new', help='stub csv to compare')
+    p.add_argument('--old', help='previous stub csv (default: the stored stub)')
+    p.add_argument('--dataset', default='grants', choices=['grants', 'contracts', 'leases'])
+    p.add_argument('--out', help='write the change log to this csv instead of printing it')
+    p.set_defaults(func=diff)
+
+    p = commands.add_parser('render', help='build the static sites from data/doge-grant-stub.csv')
+    p.add_argument('profiles', nargs='*', help='sites to build (default: all)')
+    p.add_argument('--full', action='store_true', help='ignore the row cache and render every row')
+    p.add_argument('--workers', type=int, default=1, help='processes used to render rows and pages')
+    p.set_defaults(func=render)
+
+    p = commands.add_parser('bench', help='run bench/bench_<name>.py, or list them')
+    p.add_argument('name', nargs='?', help='benchmark to run')
+    p.add_argument('args', nargs=argparse.REMAINDER, help='arguments passed to the benchmark')
+    p.set_defaults(func=bench)
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import time
+
+CACHE_TTL_S = 30 * 24 * 3600
+CACHE_MAX_BYTES = 256 * 1024 ** 2
+JOURNAL_SYNC_EVERY = 100
+
+
+class AwardCache:
+    """On-disk cache of raw USASpending award JSON keyed by award id.
+
+    Entries are stored under the sha1 of the award id with their fetch time.
+    Entries older than ttl_s are dropped on read and on prune(); prune() also
+    evicts least recently used entries (by file mtime, refreshed on every hit)
+    until the cache fits in max_bytes.
+    """
+
+    def __init__(self, cache_dir, ttl_s=CACHE_TTL_S, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, award_id):
+        digest = hashlib.sha1(award_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + '.json')
+
+    def get(self, award_id):
+        path = self._path(award_id)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if time.time() - entry.get('fetched_at', 0) > self.ttl_s:
+            self._remove(path)
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return entry['data']
+
+    def put(self, award_id, data):
+        path = self._path(award_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'award_id': award_id, 'fetched_at': time.time(), 'data': data}, f)
+        os.replace(tmp_path, path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            self.evictions += 1
+        except OSError:
+            pass
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.json'):
+                    st = os.stat(os.path.join(root, name))
+                    entries.append((st.st_mtime, st.st_size, os.path.join(root, name)))
+        return entries
+
+    def prune(self):
+        now = time.time()
+        kept = []
+        for mtime, size, path in self._entries():
+            # mtime only moves forward on hits, so an old mtime bounds fetched_at
+            if now - mtime > self.ttl_s:
+                self._remove(path)
+            else:
+                kept.append((mtime, size, path))
+        total = sum(size for _, size, _ in kept)
+        for mtime, size, path in sorted(kept):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def report(self, calls=None, period=None):
+        n = self.hits + self.misses
+        line = 'USASpending cache: {} hits, {} misses ({:.0%} hit rate), {} evicted'.format(
+            self.hits, self.misses, self.hits / n if n else 0, self.evictions)
+        if calls and period:
+            line += ', ~{:.0f} s of rate-limit budget saved'.format(self.hits * period / calls)
+        print(line)
+
+
+class EnrichJournal:
+    """Append-only log of the award lookups of an enrichment run not yet saved.
+
+    One JSON line per award id: the award JSON, or the HTTP status of a
+    failure that will not change on retry. Lines are flushed as results come
+    in and fsynced every sync_every lines, so a run that crashes or times out
+    loses at most that many; a line cut short by the crash is skipped on
+    load. The run that saves the enriched rows clears the journal.
+    """
+
+    def __init__(self, path, sync_every=JOURNAL_SYNC_EVERY):
+        self.path = path
+        self.sync_every = sync_every
+        self._f = None
+        self._unsynced = 0
+
+    def load(self):
+        """{award_id: {'data': ...} or {'status': ...}}, later lines winning."""
+        entries = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    entries[entry.pop('award_id')] = entry
+        except OSError:
+            pass
+        return entries
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._f = open(self.path, 'a', encoding='utf-8')
+        # Start on a fresh line after a torn last line
+        if self._f.tell() > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self._f.write('\n')
+        return self
+
+    def add(self, award_id, data=None, status=None):
+        entry = {'award_id': award_id}
+        entry.update({'data': data} if status is None else {'status': status})
+        self._f.write(json.dumps(entry) + '\n')
+        self._f.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self._sync()
+
+    def _sync(self):
+        os.fsync(self._f.fileno())
+        self._unsynced = 0
+
+    def __exit__(self, *exc):
+        self._sync()
+        self._f.close()
+        self._f = None
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,211 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+NEW = 'new'
+UNCHANGED = 'unchanged'
+CHANGED = 'changed'
+
+ADDED = 'added'
+MODIFIED = 'modified'
+DELETED = 'deleted'
+CHANGE_COLUMNS = ['dt_scrape', 'row_key', 'change', 'field', 'old', 'new']
+
+KEY_COLUMNS = ['link']
+DT_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _is_number(v):
+    return isinstance(v, (int, float, np.number)) and not isinstance(v, bool)
+
+
+def _normalize_col(col):
+    # Map every value to a canonical string so CSV-reloaded history and freshly
+    # scraped JSON hash the same way (1000 == 1000.0, NaN/None == '', and a
+    # Timestamp formats the same inside a datetime or an object column).
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        # Normalize each category once and take the codes back to the rows
+        cats = _normalize_col(pd.Series(col.cat.categories, dtype=object)).to_numpy()
+        codes = col.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, cats[codes], ''), dtype=object)
+    if isinstance(col.dtype, pd.StringDtype):
+        return pd.Series(col.fillna('').to_numpy(dtype=object), dtype=object)
+    if pd.api.types.is_bool_dtype(col):
+        out = col.astype(str)
+    elif pd.api.types.is_numeric_dtype(col):
+        out = col.astype('float64').astype(str)
+    elif pd.api.types.is_datetime64_any_dtype(col):
+        out = col.dt.strftime(DT_FORMAT)
+    else:
+        out = col.astype(object)
+        is_num = out.map(_is_number)
+        is_dt = out.map(lambda v: isinstance(v, (datetime, np.datetime64)))
+        if is_num.any() or is_dt.any():
+            out = out.copy()
+            out[is_num] = out[is_num].astype('float64').astype(str)
+            out[is_dt] = pd.to_datetime(out[is_dt]).dt.strftime(DT_FORMAT)
+        out = out.astype(str)
+    return out.where(col.notna() & (out != 'nan') & (out != 'NaT'), '').reset_index(drop=True)
+
+
+def row_fingerprints(df, columns):
+    if len(df) == 0:
+        return pd.Series([], dtype='uint64')
+    norm_df = pd.DataFrame({c: _normalize_col(df[c]) for c in columns})
+    return pd.Series(pd.util.hash_pandas_object(norm_df, index=False).values, index=df.index)
+
+
+def award_ids(links):
+    """The last path segment of each URL, e.g. the award id of a USASpending link; NaN when there is none."""
+    links = pd.Series(links, dtype=object)
+    links = links.where(links.map(type).eq(str), '')
+    return links.str.extract(r'^https?://[^/]+/(?:.*/)?([^/]+?)/?$', expand=False)
+
+
+def row_keys(df, key_column=None, columns=()):
+    """Identity of each row across scrapes.
+
+    The award id in key_column when it has one, else a fingerprint of
+    `columns`, the fields that do not change when DOGE revises a row. A key
+    repeating in df gets #2, #3, ... in the order of the rows' contents, so
+    the same rows get the same keys whatever order the API lists them in.
+    """
+    if key_column in df.columns:
+        keys = pd.Series(award_ids(df[key_column]).to_numpy(), index=df.index, dtype=object)
+    else:
+        keys = pd.Series(np.nan, index=df.index, dtype=object)
+    missing = keys.isna()
+    if missing.any():
+        columns = [c for c in columns if c in df.columns] or list(df.columns)
+        keys[missing] = ['fp:{:016x}'.format(fp) for fp in row_fingerprints(df[missing], columns)]
+    n = pd.Series(0, index=df.index)
+    repeated = keys.duplicated(keep=False)
+    if repeated.any():
+        order = pd.DataFrame({'key': keys[repeated], 'fp': row_fingerprints(df[repeated], list(df.columns))})
+        order = order.sort_values(['key', 'fp'], kind='stable')
+        n[order.index] = order.groupby('key').cumcount()
+    return keys.where(n == 0, keys + '#' + (n + 1).astype(str))
+
+
+def stub_changes(old_df, new_df, key_column, columns, dt_scrape):
+    """Keys of new_df's rows and the change log from old_df, stamped dt_scrape.
+
+    Rows are keyed by row_keys(df, key_column, columns). The log is None
+    when there is no old_df to compare with.
+    """
+    keys = row_keys(new_df, key_column, columns)
+    if not len(old_df):
+        return keys, None
+    changes_df = change_log(old_df, new_df, row_keys(old_df, key_column, columns), keys, new_df.columns)
+    changes_df['dt_scrape'] = dt_scrape
+    return keys, changes_df
+
+
+def change_log(old_df, new_df, old_keys, new_keys, columns):
+    """Field-level changes from old_df to new_df, rows matched by key.
+
+    One record per added or deleted row, and one per field that differs in
+    a row kept, with old and new values as normalized strings. Returns a
+    frame of CHANGE_COLUMNS without dt_scrape filled in.
+    """
+    old_keys, new_keys = pd.Index(old_keys), pd.Index(new_keys)
+    is_added = ~new_keys.isin(old_keys)
+    is_deleted = ~old_keys.isin(new_keys)
+    new_pos = np.flatnonzero(~is_added)
+    old_pos = old_keys.get_indexer(new_keys[new_pos])
+    parts = [
+        pd.DataFrame({'row_key': new_keys[is_added], 'change': ADDED, 'field': '',
+                      'pos': np.flatnonzero(is_added), 'col': -1}),
+        pd.DataFrame({'row_key': old_keys[is_deleted], 'change': DELETED, 'field': '',
+                      'pos': len(new_keys) + np.flatnonzero(is_deleted), 'col': -1}),
+    ]
+    for i, col in enumerate(c for c in columns if c in old_df.columns and c in new_df.columns):
+        old_values = _normalize_col(old_df[col].iloc[old_pos]).to_numpy()
+        new_values = _normalize_col(new_df[col].iloc[new_pos]).to_numpy()
+        differs = old_values != new_values
+        parts.append(pd.DataFrame({'row_key': new_keys[new_pos[differs]], 'change': MODIFIED, 'field': col,
+                                   'old': old_values[differs], 'new': new_values[differs],
+                                   'pos': new_pos[differs], 'col': i}))
+    changes = pd.concat(parts, ignore_index=True).sort_values(['pos', 'col'], kind='stable')
+    return changes.reindex(columns=CHANGE_COLUMNS).fillna('').reset_index(drop=True)
+
+
+class HistoryIndex:
+    """Row and key fingerprints of the stored history, built chunk by chunk.
+
+    Only two uint64 arrays are kept, so the history itself never has to be
+    held in memory to diff a scrape against it.
+    """
+
+    def __init__(self, columns, key_columns=KEY_COLUMNS):
+        self.columns = list(columns)
+        self.key_columns = [k for k in key_columns if k in self.columns]
+        self.seen_columns = set()
+        self._fp = []
+        self._key = []
+
+    @classmethod
+    def from_chunks(cls, chunks, columns, key_columns=KEY_COLUMNS):
+        index = cls(columns, key_columns)
+        for chunk in chunks:
+            index.add(chunk)
+        return index
+
+    def add(self, df):
+        self.seen_columns.update(df.columns)
+        has_keys = all(k in df.columns for k in self.key_columns)
+        df = df.reindex(columns=self.columns)
+        self._fp.append(row_fingerprints(df, self.columns).to_numpy())
+        if self.key_columns:
+            key_fp = row_fingerprints(df, self.key_columns).to_numpy()
+            # A history without the key column cannot match anything by key
+            self._key.append(key_fp if has_keys else np.zeros(0, dtype='uint64'))
+        return self
+
+    def __len__(self):
+        return sum(len(fp) for fp in self._fp)
+
+    def classify(self, stub_df):
+        """Label each stub row as new, unchanged or changed against the history.
+
+        Returns a status Series aligned with stub_df and a dict mapping each
+        unchanged stub label to the positional indices of its matches in the
+        history.
+        """
+        old_fp = np.concatenate(self._fp) if self._fp else np.zeros(0, dtype='uint64')
+        stub_fp = row_fingerprints(stub_df, self.columns)
+
+        status = pd.Series(NEW, index=stub_df.index, dtype=object)
+        unchanged = stub_fp.isin(old_fp)
+        status[unchanged] = UNCHANGED
+
+        if self.key_columns and len(old_fp):
+            old_key = np.concatenate(self._key)
+            stub_key = row_fingerprints(stub_df, self.key_columns)
+            has_key = (stub_df[self.key_columns].fillna('').astype(str) != '').any(axis=1)
+            changed = ~unchanged & has_key & stub_key.isin(old_key)
+            status[changed] = CHANGED
+
+        order = np.argsort(old_fp, kind='stable')
+        sorted_fp = old_fp[order]
+        matched_fp = stub_fp[unchanged].to_numpy()
+        lo = np.searchsorted(sorted_fp, matched_fp, side='left')
+        hi = np.searchsorted(sorted_fp, matched_fp, side='right')
+        matched_idx = {idx: order[a:b] for idx, a, b in zip(stub_fp[unchanged].index, lo, hi)}
+        return status, matched_idx
+
+
+def classify_rows(old_df, stub_df, key_columns=KEY_COLUMNS):
+    return HistoryIndex(stub_df.columns, key_columns).add(old_df).classify(stub_df)
+
+
+def diff_rows(old_df, stub_df, key_columns=KEY_COLUMNS):
+    """old_df may be a frame or an already built HistoryIndex."""
+    if isinstance(old_df, HistoryIndex):
+        status, matched_idx = old_df.classify(stub_df)
+    else:
+        status, matched_idx = classify_rows(old_df, stub_df, key_columns)
+    new_df = stub_df[status != UNCHANGED].copy()
+    drop_idx = [matched_idx[idx] for idx in stub_df.index if idx in matched_idx]
+    return new_df, drop_idx, status
@@ -0,0 +1,260 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import time
+from itertools import repeat
+from operator import itemgetter
+from urllib.parse import unquote_plus
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests as req
+
+from doge_fetch import HTTP_STATS, make_session
+
+USAS_API_ROOT = 'https://api.usaspending.gov/api/v2/awards/'
+# Flattened award fields renamed so they do not collide with DOGE's columns
+USAS_RENAMES = {'description': 'description_usas'}
+# Awards flattened per task when normalizing in worker processes
+NORMALIZE_CHUNK = 1000
+# FPDS viewLinkController query parameters, named as the old FPDS scraper's columns
+FPDS_LINK_FIELDS = {
+    'agencyID': 'award_agency',
+    'PIID': 'award_procurement_id',
+    'modNumber': 'award_modification_num',
+    'idvAgencyID': 'ref_idv_agency',
+    'idvPIID': 'ref_idv_procurement_id',
+    'contractType': 'contract_type',
+}
+
+# USASpending rate limit, N_REQ requests every LIMIT_S seconds
+N_REQ = 10
+LIMIT_S = 3
+N_WORKERS = 8
+N_RETRY = 4
+BACKOFF_S = 1.0
+# 4xx answers other than 429 will not change on retry
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Status passed to on_result for a url left unfetched when the time budget ran out
+SKIPPED = 'skipped'
+
+
+class APIError(Exception):
+    def __init__(self, status_code):
+        super().__init__('API response: {}'.format(status_code))
+        self.status_code = status_code
+
+
+class TokenBucket:
+    # Refills at calls/period. burst=1 spaces requests evenly, so no sliding
+    # window of `period` seconds ever sees more than `calls` requests.
+    def __init__(self, calls=N_REQ, period=LIMIT_S, burst=1):
+        self.rate = calls / period
+        self.capacity = burst
+        self.tokens = burst
+        self.t_last = time.monotonic()
+        self.sleep_s = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, deadline=None):
+        """Wait for a token; False, without one, if it would come after the monotonic deadline."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.t_last) * self.rate)
+                self.t_last = now
+                if self.tokens >= 1:
+                    if deadline is not None and now >= deadline:
+                        return False
+                    self.tokens -= 1
+                    return True
+                wait_s = (1 - self.tokens) / self.rate
+                if deadline is not None and now + wait_s >= deadline:
+                    return False
+                self.sleep_s += wait_s
+                await asyncio.sleep(wait_s)
+
+
+def award_url(link, api_root=USAS_API_ROOT):
+    return os.path.join(api_root, os.path.basename(link))
+
+
+def _get_json(session, url, headers):
+    r = session.get(url, headers=headers, timeout=60)
+    if r.status_code != 200:
+        raise APIError(r.status_code)
+    return r.json()
+
+
+async def _fetch_one(session, pool, bucket, url, headers, n_retry, backoff_s, deadline):
+    # (record, None) on success; (None, status) for an answer that will not
+    # change on retry, (None, None) when the retries ran out
+    loop = asyncio.get_running_loop()
+    for attempt in range(n_retry + 1):
+        if not await bucket.acquire(deadline):
+            return None, SKIPPED
+        try:
+            return await loop.run_in_executor(pool, _get_json, session, url, headers), None
+        except APIError as e:
+            if e.status_code not in RETRY_STATUS:
+                return None, e.status_code
+            if attempt == n_retry:
+                return None, None
+        except req.RequestException:
+            if attempt == n_retry:
+                return None, None
+        await asyncio.sleep(backoff_s * 2 ** attempt + random.uniform(0, backoff_s))
+
+
+async def _fetch_all(urls, headers, calls, period, n_workers, n_retry, backoff_s, on_result, budget_s):
+    from tqdm import tqdm
+    bucket = TokenBucket(calls, period)
+    deadline = time.monotonic() + budget_s if budget_s else None
+    records = [None] * len(urls)
+    todo = [(i, url) for i, url in enumerate(urls) if url]
+    with make_session(n_workers) as session, ThreadPoolExecutor(n_workers) as pool, \
+            tqdm(total=len(todo)) as pbar:
+        async def run(i, url):
+            records[i], status = await _fetch_one(session, pool, bucket, url, headers, n_retry, backoff_s, deadline)
+            if on_result is not None:
+                on_result(i, records[i], status)
+            pbar.update(1)
+        await asyncio.gather(*(run(i, url) for i, url in todo))
+    HTTP_STATS.add_throttle(bucket.sleep_s)
+    return records
+
+
+def fetch_awards(urls, headers=None, calls=N_REQ, period=LIMIT_S, n_workers=N_WORKERS,
+                 n_retry=N_RETRY, backoff_s=BACKOFF_S, on_result=None, budget_s=None):
+    """Fetch award JSON for each url concurrently; falsy urls and failures give None.
+
+    on_result(i, record, status) is called as each url finishes. status is
+    None, the HTTP status of a failure not worth retrying, or SKIPPED when
+    budget_s seconds ran out before the url could be requested.
+    """
+    return asyncio.run(_fetch_all(list(urls), headers or {}, calls, period, n_workers, n_retry, backoff_s,
+                                  on_result, budget_s))
+
+
+def _flatten_into(flat, obj, prefix, sep):
+    for k, v in obj.items():
+        key = f'{prefix}{sep}{k}'
+        if isinstance(v, dict):
+            _flatten_into(flat, v, key, sep)
+        else:
+            flat[key] = v
+
+
+def flatten_award(record, sep='_'):
+    """One award's JSON as a flat dict, keyed and ordered as pd.json_normalize does it.
+
+    Top-level values that are not objects come first, then every nested
+    object's leaves under their joined path; lists stay as they are.
+    """
+    flat, nested = {}, {}
+    for k, v in record.items():
+        if isinstance(v, dict):
+            _flatten_into(nested, v, k, sep)
+        else:
+            flat[k] = v
+    flat.update(nested)
+    return flat
+
+
+# Awards of the running awards_to_frame call, read by forked workers so that
+# only chunk bounds are sent to them
+_POOL_RECORDS = None
+
+
+def _flatten_chunk(records, columns, only, sep):
+    # Column lists over the known columns some award here has, then, unless
+    # only, the fields first seen here in the order they appear
+    flats = [flatten_award(r or {}, sep) for r in records]
+    seen = set().union(*flats)
+    names = [c for c in columns if c in seen]
+    if not only and len(names) < len(seen):
+        known = set(names)
+        names += [k for k in dict.fromkeys(k for flat in flats for k in flat) if k not in known]
+    if not names:
+        return names, []
+    get = itemgetter(*names) if len(names) > 1 else lambda flat: (flat[names[0]],)
+    rows = []
+    for flat in flats:
+        try:
+            rows.append(get(flat))
+        except KeyError:
+            rows.append(tuple(flat.get(c, np.nan) for c in names))
+    return names, [list(col) for col in zip(*rows)]
+
+
+def _flatten_range(start, stop, columns, only, sep):
+    return _flatten_chunk(_POOL_RECORDS[start:stop], columns, only, sep)
+
+
+def _frame_in_workers(records, columns, only, n_workers, chunksize, sep):
+    global _POOL_RECORDS
+    starts = list(range(0, len(records), chunksize))
+    n_workers = min(n_workers, len(starts))
+    if 'fork' in multiprocessing.get_all_start_methods():
+        _POOL_RECORDS = records
+        try:
+            with ProcessPoolExecutor(n_workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                parts = list(pool.map(_flatten_range, starts, [i + chunksize for i in starts],
+                                      repeat(columns), repeat(only), repeat(sep)))
+        finally:
+            _POOL_RECORDS = None
+    else:
+        with ProcessPoolExecutor(n_workers) as pool:
+            parts = list(pool.map(_flatten_chunk, (records[i:i + chunksize] for i in starts),
+                                  repeat(columns), repeat(only), repeat(sep)))
+    # Each column joined once, padded where a chunk has none of it
+    names = list(dict.fromkeys(name for part_names, _ in parts for name in part_names))
+    data = {name: [] for name in names}
+    for start, (part_names, part_columns) in zip(starts, parts):
+        part = dict(zip(part_names, part_columns))
+        n_rows = min(chunksize, len(records) - start)
+        for name in names:
+            values = part.get(name)
+            data[name] += values if values is not None else [np.nan] * n_rows
+    return pd.DataFrame(data, index=pd.RangeIndex(len(records)), columns=names)
+
+
+def awards_to_frame(records, columns=(), fields=None, n_workers=1, chunksize=NORMALIZE_CHUNK):
+    """Flatten award JSON into one row per award, as pd.json_normalize(records, sep='_').
+
+    columns are the fields known from earlier runs: they come first, in that
+    order, and any new field after them. fields keeps only those fields.
+    Both are output names, i.e. after USAS_RENAMES. With n_workers > 1,
+    workers flatten chunks of awards into column lists keyed by the known
+    columns, and the columns are joined once, so dtypes are inferred as for
+    a single batch.
+    """
+    raw_names = {new: old for old, new in USAS_RENAMES.items()}
+    only = fields is not None
+    columns = [raw_names.get(c, c) for c in (fields if only else columns)]
+    if n_workers > 1 and len(records) > chunksize:
+        usas_df = _frame_in_workers(records, columns, only, n_workers, chunksize, '_')
+    else:
+        flats = [flatten_award(r or {}, '_') for r in records]
+        if only:
+            flats = [{k: flat[k] for k in columns if k in flat} for flat in flats]
+        usas_df = pd.DataFrame(flats, index=pd.RangeIndex(len(records)))
+    if only:
+        usas_df = usas_df.reindex(columns=columns)
+    elif columns:
+        known = [c for c in columns if c in usas_df.columns]
+        usas_df = usas_df[known + usas_df.columns.difference(known, sort=False).tolist()]
+    return usas_df.rename(columns=USAS_RENAMES)
+
+
+def fpds_links_to_frame(links):
+    """Award ids parsed out of FPDS links; no request is made to FPDS."""
+    links = pd.Series(links, dtype=object).reset_index(drop=True)
+    links = links.where(links.map(type).eq(str), '')
+    fpds_df = pd.DataFrame(index=links.index)
+    for param, column in FPDS_LINK_FIELDS.items():
+        values = links.str.extract(r'[?&]{}=([^&#]*)'.format(param), expand=False)
+        fpds_df[column] = values.map(unquote_plus, na_action='ignore')
+    return fpds_df
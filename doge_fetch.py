@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+import requests as req
+from requests.adapters import HTTPAdapter
+
+DOGE_API_ROOT = 'https://api.doge.gov/savings/'
+
+N_PAGE_WORKERS = 4
+N_PAGE_RETRY = 3
+PAGE_BACKOFF_S = 2.0
+
+
+class HttpStats:
+    """Process-wide counters of the HTTP traffic of every make_session session."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.bytes = 0
+        self.throttle_s = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, r, *args, **kwargs):
+        n_bytes = len(r.content)
+        with self._lock:
+            self.requests += 1
+            # A 304 answers a conditional request; it is not a failure
+            self.errors += r.status_code >= 400
+            self.not_modified += r.status_code == 304
+            self.bytes += n_bytes
+
+    def add_throttle(self, sleep_s):
+        with self._lock:
+            self.throttle_s += sleep_s
+
+    def snapshot(self):
+        with self._lock:
+            return {'http_requests': self.requests, 'http_errors': self.errors,
+                    'http_not_modified': self.not_modified, 'http_bytes': self.bytes, 'throttle_s': self.throttle_s}
+
+
+HTTP_STATS = HttpStats()
+
+
+def make_session(n_workers):
+    session = req.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=n_workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.hooks['response'].append(HTTP_STATS.record)
+    return session
+
+
+def conditional_headers(validators):
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+def get_page(session, url, params, page, n_retry=N_PAGE_RETRY, backoff_s=PAGE_BACKOFF_S, validators=None):
+    # Retry a single page on its own; a page that keeps failing aborts the scrape
+    # rather than silently leaving a hole in the table.
+    # validators holds the ETag/Last-Modified of an earlier answer: they are sent
+    # as conditional headers, a 304 answer gives None and a 200 answer replaces them.
+    headers = conditional_headers(validators) if validators else None
+    for attempt in range(n_retry + 1):
+        try:
+            r = session.get(url, params={**params, 'page': page}, headers=headers, timeout=60)
+            if r.status_code == 304 and headers:
+                return None
+            if r.status_code == 200:
+                page_json = r.json()
+                if validators is not None:
+                    validators.clear()
+                    validators.update(etag=r.headers.get('ETag'), last_modified=r.headers.get('Last-Modified'))
+                return page_json
+            err = Exception('API response: {} (page {})'.format(r.status_code, page))
+        except (req.RequestException, ValueError) as e:
+            err = e
+        if attempt < n_retry:
+            time.sleep(backoff_s * 2 ** attempt)
+    raise err
+
+
+def _shared(stack, session, pool, n_workers):
+    # Endpoints scraped together pass one session and one page pool, so they
+    # share the connection pool and the number of pages in flight
+    if session is None:
+        session = stack.enter_context(make_session(n_workers))
+    if pool is None:
+        pool = stack.enter_context(ThreadPoolExecutor(max(1, n_workers)))
+    return session, pool
+
+
+def fetch_pages(api_root, endpoint_str, params, n_workers=N_PAGE_WORKERS, session=None, pool=None):
+    """Return the records of every page of an endpoint, in page order.
+
+    Page 1 is fetched first to learn meta.pages; the remaining pages are then
+    fetched concurrently on a pooled session by at most n_workers threads.
+    """
+    url = os.path.join(api_root, endpoint_str)
+    with ExitStack() as stack:
+        session, pool = _shared(stack, session, pool, n_workers)
+        first = get_page(session, url, params, 1)
+        n_pages = first['meta']['pages']
+        rest = list(pool.map(lambda page: get_page(session, url, params, page), range(2, n_pages + 1)))
+    json_list = []
+    for page_json in [first] + rest:
+        json_list.extend(page_json['result'][endpoint_str])
+    return json_list
+
+
+def fetch_new_pages(api_root, endpoint_str, params, is_known, validators=None, n_workers=N_PAGE_WORKERS,
+                    session=None, pool=None):
+    """Fetch pages in order up to and including the first one is_known accepts.
+
+    Returns the records read and whether the scrape stopped early, or
+    (None, True) when page 1 was not modified since validators were taken.
+    Pages after the first are fetched n_workers at a time, so up to
+    n_workers - 1 pages past the stopping page may be downloaded and dropped.
+    """
+    url = os.path.join(api_root, endpoint_str)
+    with ExitStack() as stack:
+        session, pool = _shared(stack, session, pool, n_workers)
+        first = get_page(session, url, params, 1, validators=validators)
+        if first is None:
+            return None, True
+        n_pages = first['meta']['pages']
+        pages = [first['result'][endpoint_str]]
+        stopped = is_known(pages[0])
+        next_page = 2
+        while not stopped and next_page <= n_pages:
+            batch = range(next_page, min(n_pages, next_page + n_workers - 1) + 1)
+            for page_json in pool.map(lambda page: get_page(session, url, params, page), batch):
+                pages.append(page_json['result'][endpoint_str])
+                if is_known(pages[-1]):
+                    stopped = True
+                    break
+            next_page = batch[-1] + 1
+    return [record for page in pages for record in page], stopped
@@ -0,0 +1,80 @@
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from doge_fetch import HTTP_STATS
+
+RUN_LOG = 'doge-runs.jsonl'
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return round(peak / (1024 ** 2 if sys.platform == 'darwin' else 1024), 1)
+
+
+class RunReport:
+    """Wall time, peak memory, row counts and HTTP traffic of each stage of a run.
+
+    Each stage records the process peak RSS at its end, so the stage where it
+    jumps is the one that raised the peak. HTTP counts are the traffic of
+    every make_session session during the stage, throttle_s the time the
+    USASpending rate limiter slept.
+    """
+
+    def __init__(self, **info):
+        self.info = info
+        self.stages = []
+        self.started = datetime.now()
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        entry = {'stage': name}
+        if rows_in is not None:
+            entry['rows_in'] = rows_in
+        http0 = HTTP_STATS.snapshot()
+        t0 = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['seconds'] = round(time.perf_counter() - t0, 3)
+            entry['peak_rss_mb'] = peak_rss_mb()
+            http1 = HTTP_STATS.snapshot()
+            for key, value in http1.items():
+                if value != http0[key]:
+                    entry[key] = round(value - http0[key], 3)
+            self.stages.append(entry)
+
+    def to_dict(self):
+        return dict(
+            self.info,
+            started=self.started.isoformat(timespec='seconds'),
+            seconds=round(time.perf_counter() - self._t0, 3),
+            peak_rss_mb=peak_rss_mb(),
+            python=platform.python_version(),
+            stages=self.stages,
+        )
+
+    def save(self, data_dir, filename=RUN_LOG):
+        """Append this run as one JSON line to data_dir/filename."""
+        with open(os.path.join(data_dir, filename), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.to_dict(), default=str) + '\n')
+
+    def print_summary(self):
+        for entry in self.stages:
+            extra = ', '.join('{} {}'.format(k, v) for k, v in entry.items()
+                              if k not in ('stage', 'seconds', 'peak_rss_mb'))
+            print('{:<18} {:>8.2f} s  {:>7} MB peak  {}'.format(
+                entry['stage'], entry['seconds'], entry['peak_rss_mb'], extra))
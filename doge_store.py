@@ -0,0 +1,821 @@
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing, contextmanager
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 5000
+# sha256 and size of every file the stores in a directory wrote
+MANIFEST_NAME = 'doge-manifest.json'
+SQLITE_NAME = 'doge.sqlite'
+# Indexed in every SQLite table that has them; the text columns are also
+# searchable by substring through an FTS5 trigram index
+SQL_INDEX_COLUMNS = ['row_key', 'link', 'date', 'agency', 'recipient', 'state']
+SQL_TEXT_COLUMNS = ['agency', 'recipient', 'description_doge']
+# SQLite caps the parameters of one statement
+SQL_MAX_PARAMS = 500
+# Written as DOGE serves them and the published CSVs have always held them, m/d/YYYY
+CSV_DATE_COLUMNS = ['date', 'deleted_date']
+
+# Explicit dtypes per stored table; columns not listed keep what the reader infers.
+# Repeated labels are categories, free text is Arrow-backed strings, and
+# dt_scrape, one stamp per run, is a category too.
+TEXT = 'string[pyarrow]'
+GRANT_SCHEMA = {
+    'date': 'datetime',
+    'uploaded_dt': 'datetime',
+    'value': 'float64',
+    'savings': 'float64',
+    'agency': 'category',
+    'recipient': 'category',
+    'state': 'category',
+    'link': TEXT,
+    'description_doge': TEXT,
+    'dt_scrape': 'category',
+}
+CONTRACT_SCHEMA = {
+    'deleted_date': 'datetime',
+    'value': 'float64',
+    'savings': 'float64',
+    'agency': 'category',
+    'vendor': 'category',
+    'fpds_status': 'category',
+    'piid': TEXT,
+    'fpds_link': TEXT,
+    'description_doge': TEXT,
+    'dt_scrape': 'category',
+}
+LEASE_SCHEMA = {
+    'date': 'datetime',
+    'sq_ft': 'Int64',
+    'value': 'float64',
+    'savings': 'float64',
+    'agency': 'category',
+    'city': 'category',
+    'state': 'category',
+    'location': TEXT,
+    'description_doge': TEXT,
+    'dt_scrape': 'category',
+}
+SCHEMAS = {
+    'grant': GRANT_SCHEMA,
+    'contract': CONTRACT_SCHEMA,
+    'property': LEASE_SCHEMA,
+}
+# One entry per DOGE endpoint: stored table, dtypes, the column that identifies
+# a row across edits, the columns that do when it holds no award id, and the
+# date the API sorts on
+DATASET_TABLES = {
+    'grants': {'table': 'doge-grant', 'schema': GRANT_SCHEMA, 'key_column': 'link',
+               'identity_columns': ['date', 'agency', 'recipient', 'value'], 'date_column': 'date'},
+    'contracts': {'table': 'doge-contract', 'schema': CONTRACT_SCHEMA, 'key_column': 'fpds_link',
+                  'identity_columns': ['piid', 'agency', 'vendor', 'value'], 'date_column': 'deleted_date'},
+    'leases': {'table': 'doge-property', 'schema': LEASE_SCHEMA, 'key_column': None,
+               'identity_columns': ['location', 'agency', 'sq_ft'], 'date_column': 'date'},
+}
+
+
+def schema_for(name):
+    # 'doge-grant-stub' -> GRANT_SCHEMA
+    for key, schema in SCHEMAS.items():
+        if '-{}'.format(key) in name:
+            return schema
+    return {}
+
+
+def read_dtypes(schema):
+    # Only categories and text are fixed at parse time; dates and amounts are
+    # coerced by apply_schema so that a stray value cannot make the reader raise.
+    return {col: dtype for col, dtype in schema.items() if dtype in ('category', TEXT)}
+
+
+def apply_schema(df, schema):
+    for col, dtype in schema.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if dtype == 'datetime':
+            if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = pd.to_datetime(df[col].replace('', None), errors='coerce', format='mixed')
+        elif dtype in ('category', TEXT):
+            df[col] = df[col].astype(dtype)
+        else:
+            values = pd.to_numeric(df[col].replace('', None), errors='coerce')
+            if dtype == 'Int64' and (values.dropna() % 1 != 0).any():
+                dtype = 'float64'
+            df[col] = values.astype(dtype)
+    return df
+
+
+class CorruptTableError(Exception):
+    pass
+
+
+def file_digests(path, at_size=None):
+    """sha256 of a file, and of its first at_size bytes (None past the end)."""
+    sha = hashlib.sha256()
+    prefix = sha.hexdigest() if at_size == 0 else None
+    n_read = 0
+    with open(path, 'rb') as f:
+        while True:
+            n = 1 << 20
+            if at_size is not None and n_read < at_size:
+                n = min(n, at_size - n_read)
+            block = f.read(n)
+            if not block:
+                break
+            sha.update(block)
+            n_read += len(block)
+            if n_read == at_size:
+                prefix = sha.hexdigest()
+    return sha.hexdigest(), prefix
+
+
+def _fsync_dir(path):
+    fd = os.open(path or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path, manifest=None, mode='w'):
+    """Write path through a temporary file that replaces it only once complete and on disk.
+
+    With a manifest, the new file is recorded before the swap, keeping the
+    old entry as `previous` so a crash between the two still verifies.
+    """
+    tmp_path = '{}.tmp-{}'.format(path, os.getpid())
+    kwargs = {} if 'b' in mode else {'newline': '', 'encoding': 'utf-8'}
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        if manifest is not None:
+            manifest.record(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(os.path.dirname(path))
+
+
+class Manifest:
+    """Checksums of the files in one directory, in MANIFEST_NAME.
+
+    Files never written through a store, e.g. checked out from git before
+    the manifest existed, have no entry and are not checked.
+    """
+
+    def __init__(self, data_dir):
+        self.path = os.path.join(data_dir, MANIFEST_NAME)
+
+    def entries(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, path, written_path=None):
+        """Record path as it is now, or as the not yet renamed written_path."""
+        written_path = written_path or path
+        entries = self.entries()
+        entry = {'size': os.path.getsize(written_path), 'sha256': file_digests(written_path)[0]}
+        old = entries.get(os.path.basename(path))
+        if old is not None:
+            entry['previous'] = {'size': old['size'], 'sha256': old['sha256']}
+        entries[os.path.basename(path)] = entry
+        with atomic_write(self.path) as f:
+            json.dump(entries, f, indent=1, sort_keys=True)
+
+    def verify(self, path):
+        """Raise CorruptTableError unless path is the file last recorded for it.
+
+        Bytes past the recorded end, left by an append that never got to
+        record itself, are cut off: the run that wrote them did not finish.
+        """
+        entry = self.entries().get(os.path.basename(path))
+        if entry is None:
+            return
+        size = os.path.getsize(path)
+        digest, prefix = file_digests(path, entry['size'])
+        for known in (entry, entry.get('previous')):
+            if known and size == known['size'] and digest == known['sha256']:
+                return
+        if size > entry['size'] and prefix == entry['sha256']:
+            print('{}: dropping {} bytes left by an interrupted append'.format(path, size - entry['size']))
+            os.truncate(path, entry['size'])
+            return
+        raise CorruptTableError('{} does not match its checksum in {}; restore it, or delete its entry '
+                                'to accept it as it is'.format(path, self.path))
+
+
+def _is_whole(values):
+    return values.isna() | ((values % 1 == 0) & (values.abs() < 2 ** 53))
+
+
+def stored_int_columns(path, columns):
+    """Whether the CSV at path holds each of `columns` as integers.
+
+    Columns it has no value of are left out. to_csv writes every float with
+    a '.' or an exponent, so a column holding any bare integer holds integers.
+    """
+    todo = [c for c in pd.read_csv(path, nrows=0).columns if c in set(columns)]
+    found = {}
+    if not todo:
+        return found
+    with pd.read_csv(path, usecols=todo, dtype=str, chunksize=CHUNK_ROWS) as reader:
+        for chunk in reader:
+            for col in todo:
+                values = chunk[col].dropna()
+                if col not in found and len(values):
+                    found[col] = bool(values.str.fullmatch(r'-?\d+').any())
+            if len(found) == len(todo):
+                break
+    return found
+
+
+def whole_columns(df, path=None):
+    """Float columns to write as integers.
+
+    Columns the CSV at path already holds keep its format, so neither an
+    append nor a rewrite turns 100.0 into 100 or back. Others are integers
+    when all of df's values are whole, as pandas read them from JSON.
+    """
+    floats = [col for col in df.columns if pd.api.types.is_float_dtype(df[col])]
+    stored = stored_int_columns(path, floats) if path is not None and os.path.exists(path) else {}
+    return [col for col in floats if (stored[col] if col in stored else _is_whole(df[col]).all())]
+
+
+def csv_text(df, whole=()):
+    """df with the columns the schema retyped written as the CSVs always held them.
+
+    Dates in CSV_DATE_COLUMNS go back to m/d/YYYY, and the whole values of
+    the `whole` float columns to integers, so a typed load and save leaves
+    the files as they were.
+    """
+    out = {}
+    for col in df.columns:
+        if col in whole:
+            is_whole = _is_whole(df[col])
+            if is_whole.all():
+                out[col] = df[col].astype('Int64')
+            else:
+                # An integer column that got a fraction: only that value keeps its decimals
+                values = df[col].astype(object)
+                ints = is_whole & df[col].notna()
+                values[ints] = df.loc[ints, col].astype('int64').astype(object)
+                out[col] = values
+        elif col in CSV_DATE_COLUMNS and pd.api.types.is_datetime64_any_dtype(df[col]):
+            # Each distinct day is formatted once; codes of missing dates pick the trailing NaN
+            codes, days = pd.factorize(df[col])
+            if (days == days.normalize()).all():
+                text = days.strftime('%m/%d/%Y').str.replace(r'(^|/)0', r'\1', regex=True)
+                out[col] = pd.Series(np.append(text.to_numpy(dtype=object), np.nan)[codes], index=df.index)
+    if not out:
+        return df
+    # A shallow copy: only the replaced columns get new arrays
+    df = df.copy(deep=False)
+    for col, values in out.items():
+        df[col] = values
+    return df
+
+
+def write_csv(f, df, header=True, chunksize=CHUNK_ROWS, whole=None):
+    # Formatting a slice at a time keeps the text of only one chunk in memory
+    whole = whole_columns(df) if whole is None else whole
+    for start in range(0, max(len(df), 1), chunksize):
+        csv_text(df.iloc[start:start + chunksize], whole).to_csv(f, header=header and start == 0, index=False)
+
+
+class CsvStore:
+    """One CSV file per table.
+
+    Writes go through atomic_write or fsynced appends and are recorded in the
+    directory's Manifest; verify() checks a table against it before a run
+    relies on it.
+    """
+    ext = '.csv'
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.manifest = Manifest(data_dir)
+
+    def path(self, name):
+        return os.path.join(self.data_dir, name + self.ext)
+
+    def exists(self, name):
+        path = self.path(name)
+        return os.path.exists(path) and os.path.getsize(path) > 0
+
+    def verify(self, name):
+        if self.exists(name):
+            self.manifest.verify(self.path(name))
+
+    def _read(self, path, columns=None, schema=None):
+        usecols = None if columns is None else set(columns).__contains__
+        return pd.read_csv(path, usecols=usecols, dtype=read_dtypes(schema or {}))
+
+    def load(self, name, schema=None, columns=None):
+        """Read a table, only `columns` of it when given."""
+        schema = schema_for(name) if schema is None else schema
+        return apply_schema(self._read(self.path(name), columns, schema), schema)
+
+    def save(self, name, df, schema=None):
+        path = self.path(name)
+        whole = whole_columns(df, path)
+        with atomic_write(path, self.manifest) as f:
+            write_csv(f, df, whole=whole)
+
+    def columns(self, name):
+        return list(pd.read_csv(self.path(name), nrows=0).columns)
+
+    def tables(self):
+        """Names of the tables stored in data_dir."""
+        if not os.path.isdir(self.data_dir):
+            return []
+        return [stem for stem, ext in map(os.path.splitext, os.listdir(self.data_dir)) if ext == self.ext]
+
+    def drop(self, name):
+        os.remove(self.path(name))
+
+    def iter_chunks(self, name, columns=None, chunksize=CHUNK_ROWS, schema=None):
+        """Yield the table in chunks, reading only `columns` when given."""
+        schema = schema_for(name) if schema is None else schema
+        usecols = None if columns is None else set(columns).__contains__
+        with pd.read_csv(self.path(name), usecols=usecols, dtype=read_dtypes(schema),
+                         chunksize=chunksize) as reader:
+            for chunk in reader:
+                yield apply_schema(chunk, schema)
+
+    def load_matching(self, name, column, values):
+        """The last stored row for each of `values` in `column`."""
+        return _last_matching(self.iter_chunks(name), column, values)
+
+    def append_rows(self, name, df, keys=None, key_rows=None):
+        """Add rows to a stored table without loading it.
+
+        keys and key_rows are ignored: a CSV table keeps every version of a row.
+        """
+        if not len(df):
+            # Nothing to add: new columns alone are not worth rewriting the table for
+            return
+        path = self.path(name)
+        if not self.exists(name):
+            return self.save(name, df)
+        # Never append after the torn tail of an earlier interrupted append
+        self.verify(name)
+        header = self.columns(name)
+        whole = whole_columns(df, path)
+        extra = [c for c in df.columns if c not in header]
+        if extra:
+            # New columns: copy the stored rows as text under the wider header
+            header = header + extra
+            with atomic_write(path, self.manifest) as f, \
+                    pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=CHUNK_ROWS) as reader:
+                pd.DataFrame(columns=header).to_csv(f, index=False)
+                for chunk in reader:
+                    chunk.reindex(columns=header).to_csv(f, header=False, index=False)
+                write_csv(f, df.reindex(columns=header), header=False, whole=whole)
+            return
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            write_csv(f, df.reindex(columns=header), header=False, whole=whole)
+            f.flush()
+            os.fsync(f.fileno())
+        self.manifest.record(path)
+
+
+class ParquetStore(CsvStore):
+    """Parquet tables with the schema baked in.
+
+    Reads fall back to the CSV of the same name so an existing data/ directory
+    migrates on the first save. With export_csv the CSV is rewritten next to
+    the Parquet file for the published repo.
+    """
+    ext = '.parquet'
+
+    def __init__(self, data_dir, export_csv=True):
+        super().__init__(data_dir)
+        self.csv = CsvStore(data_dir)
+        self.export_csv = export_csv
+
+    def exists(self, name):
+        return super().exists(name) or self.csv.exists(name)
+
+    def verify(self, name):
+        if super().exists(name):
+            self.manifest.verify(self.path(name))
+        else:
+            self.csv.verify(name)
+
+    def _read(self, path, columns=None, schema=None):
+        if columns is not None:
+            import pyarrow.parquet as pq
+            columns = [c for c in pq.read_schema(path).names if c in set(columns)]
+        return pd.read_parquet(path, columns=columns)
+
+    def load(self, name, schema=None, columns=None):
+        if not super().exists(name):
+            return self.csv.load(name, schema, columns)
+        schema = schema_for(name) if schema is None else schema
+        return apply_schema(self._read(self.path(name), columns), schema)
+
+    def save(self, name, df, schema=None):
+        df = apply_schema(df.copy(), schema_for(name) if schema is None else schema)
+        # Object columns mixing '' fillers with numbers (USASpending fields) cannot go to Arrow as is
+        for col in df.columns:
+            if pd.api.types.is_object_dtype(df[col]):
+                df[col] = df[col].replace('', None).astype('string')
+        with atomic_write(self.path(name), self.manifest, 'wb') as f:
+            df.to_parquet(f, index=False)
+        if self.export_csv:
+            self.csv.save(name, df)
+
+    def columns(self, name):
+        if not super().exists(name):
+            return self.csv.columns(name)
+        import pyarrow.parquet as pq
+        return pq.read_schema(self.path(name)).names
+
+    def iter_chunks(self, name, columns=None, chunksize=CHUNK_ROWS, schema=None):
+        if not super().exists(name):
+            yield from self.csv.iter_chunks(name, columns, chunksize, schema)
+            return
+        import pyarrow.parquet as pq
+        schema = schema_for(name) if schema is None else schema
+        pq_file = pq.ParquetFile(self.path(name))
+        if columns is not None:
+            columns = [c for c in pq_file.schema_arrow.names if c in set(columns)]
+        for batch in pq_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield apply_schema(batch.to_pandas(), schema)
+
+    def append_rows(self, name, df, keys=None, key_rows=None):
+        # Parquet files cannot be appended to; partitioned history is the
+        # bounded-memory layout for this backend.
+        if not len(df):
+            return
+        frames = [self.load(name)] if self.exists(name) else []
+        self.save(name, pd.concat(frames + [df], ignore_index=True))
+
+
+def quote_name(name):
+    """name as an SQL identifier, e.g. for a table or column name with a dash."""
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+class SqliteStore:
+    """Every table in one SQLite database, data/doge.sqlite, for indexed queries.
+
+    Rows appended with keys are upserted, so a table keeps the latest version
+    of each row rather than every version. Each table gets b-tree indexes on
+    SQL_INDEX_COLUMNS and an FTS5 trigram index named "<table>:fts" over
+    SQL_TEXT_COLUMNS, where present. Reads fall back to the CSV of the same
+    name so an existing data/ directory migrates on the first write. With
+    export_csv the CSV files are still written for the published repo.
+    """
+    ext = '.sqlite'
+
+    def __init__(self, data_dir, export_csv=True):
+        self.data_dir = data_dir
+        self.db_path = os.path.join(data_dir, SQLITE_NAME)
+        self.csv = CsvStore(data_dir)
+        self.export_csv = export_csv
+
+    def path(self, name):
+        return self.db_path
+
+    def connect(self):
+        return closing(sqlite3.connect(self.db_path))
+
+    def has_table(self, name):
+        if not os.path.exists(self.db_path):
+            return False
+        with self.connect() as conn:
+            return table_columns(conn, name) != []
+
+    def exists(self, name):
+        return self.has_table(name) or self.csv.exists(name)
+
+    def verify(self, name):
+        # Commits are atomic already; check the pages for damage on disk
+        if not self.has_table(name):
+            return self.csv.verify(name)
+        with self.connect() as conn:
+            result = conn.execute('PRAGMA quick_check').fetchone()[0]
+        if result != 'ok':
+            raise CorruptTableError('{}: {}'.format(self.db_path, result))
+
+    def columns(self, name):
+        if not self.has_table(name):
+            return self.csv.columns(name)
+        with self.connect() as conn:
+            return [c for c in table_columns(conn, name) if c != 'row_key']
+
+    def tables(self):
+        if not os.path.exists(self.db_path):
+            return []
+        with self.connect() as conn:
+            names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        # Leave out SQLite's own tables, the FTS indexes and their shadow tables
+        return [name for name in names if not name.startswith('sqlite_') and ':fts' not in name]
+
+    def drop(self, name):
+        with self.connect() as conn, conn:
+            conn.execute('DROP TABLE IF EXISTS {}'.format(quote_name(name + ':fts')))
+            conn.execute('DROP TABLE IF EXISTS {}'.format(quote_name(name)))
+
+    def _select(self, name, columns=None, where='', order=' ORDER BY rowid'):
+        names = self.columns(name)
+        if columns is not None:
+            names = [c for c in names if c in set(columns)]
+        return 'SELECT {} FROM {}{}{}'.format(', '.join(map(quote_name, names)), quote_name(name), where, order)
+
+    def load(self, name, schema=None, columns=None):
+        if not self.has_table(name):
+            return self.csv.load(name, schema, columns)
+        schema = schema_for(name) if schema is None else schema
+        with self.connect() as conn:
+            return apply_schema(pd.read_sql_query(self._select(name, columns), conn), schema)
+
+    def iter_chunks(self, name, columns=None, chunksize=CHUNK_ROWS, schema=None):
+        if not self.has_table(name):
+            yield from self.csv.iter_chunks(name, columns, chunksize, schema)
+            return
+        schema = schema_for(name) if schema is None else schema
+        with self.connect() as conn:
+            for chunk in pd.read_sql_query(self._select(name, columns), conn, chunksize=chunksize):
+                yield apply_schema(chunk, schema)
+
+    def load_matching(self, name, column, values):
+        if not self.has_table(name):
+            return self.csv.load_matching(name, column, values)
+        values = list(dict.fromkeys(values))
+        schema = schema_for(name)
+        with self.connect() as conn:
+            frames = []
+            for i in range(0, len(values), SQL_MAX_PARAMS):
+                batch = values[i:i + SQL_MAX_PARAMS]
+                where = ' WHERE {} IN ({})'.format(quote_name(column), ', '.join('?' * len(batch)))
+                frames.append(pd.read_sql_query(self._select(name, where=where), conn, params=batch))
+        return _last_matching((apply_schema(df, schema) for df in frames), column, values)
+
+    def save(self, name, df, schema=None):
+        df = apply_schema(df.copy(), schema_for(name) if schema is None else schema)
+        with self.connect() as conn, conn:
+            df.to_sql(name, conn, if_exists='replace', index=False)
+            # Replacing the table dropped its triggers and left the FTS index stale
+            _index_table(conn, name, rebuild=True)
+        if self.export_csv:
+            self.csv.save(name, df)
+
+    def append_rows(self, name, df, keys=None, key_rows=None):
+        """Add rows to a table; with keys, each replaces the stored row of the same key.
+
+        key_rows(df) gives the keys of rows carried over from the CSV table on
+        the first write; without it they are stored unkeyed.
+        """
+        if not len(df):
+            return
+        if not self.has_table(name) and self.csv.exists(name):
+            # First write: carry the CSV table over. It holds every version of
+            # a row, so rows are keyed a run at a time and later versions replace earlier ones
+            for run_df in _iter_runs(self.csv.iter_chunks(name)):
+                self._insert(name, run_df, None if key_rows is None else list(key_rows(run_df)))
+        self._insert(name, df, None if keys is None else list(keys))
+        if self.export_csv:
+            self.csv.append_rows(name, df)
+
+    def _insert(self, name, df, keys=None):
+        df = apply_schema(df.copy(), schema_for(name))
+        if keys is not None:
+            df['row_key'] = keys
+        with self.connect() as conn, conn:
+            stored = table_columns(conn, name)
+            for col in df.columns:
+                if stored and col not in stored:
+                    conn.execute('ALTER TABLE {} ADD COLUMN {}'.format(quote_name(name), quote_name(col)))
+            if stored and keys is not None:
+                conn.executemany('DELETE FROM {} WHERE row_key = ?'.format(quote_name(name)), [(k,) for k in keys])
+            df.to_sql(name, conn, if_exists='append', index=False)
+            _index_table(conn, name)
+
+
+def table_columns(conn, name):
+    """Column names of a table on an SQLite connection; [] when there is no such table."""
+    return [row[1] for row in conn.execute('PRAGMA table_info({})'.format(quote_name(name)))]
+
+
+def _index_table(conn, name, rebuild=False):
+    columns = table_columns(conn, name)
+    for col in SQL_INDEX_COLUMNS:
+        if col in columns:
+            conn.execute('CREATE INDEX IF NOT EXISTS {} ON {}({})'.format(
+                quote_name('{}:{}'.format(name, col)), quote_name(name), quote_name(col)))
+    text_columns = [c for c in SQL_TEXT_COLUMNS if c in columns]
+    if not text_columns:
+        return
+    # Triggers keep the index in step with inserts and upserts; it is only
+    # built from the whole table when created or when its columns change
+    if not rebuild and table_columns(conn, name + ':fts') == text_columns:
+        return
+    fts = quote_name(name + ':fts')
+    conn.execute('DROP TABLE IF EXISTS {}'.format(fts))
+    try:
+        conn.execute("CREATE VIRTUAL TABLE {} USING fts5({}, content={}, content_rowid='rowid', "
+                     "tokenize='trigram')".format(fts, ', '.join(map(quote_name, text_columns)), quote_name(name)))
+    except sqlite3.OperationalError:
+        # No FTS5 or no trigram tokenizer (SQLite < 3.34): queries scan instead
+        return
+    cols = ', '.join(map(quote_name, text_columns))
+    new = ', '.join('new.' + quote_name(c) for c in text_columns)
+    old = ', '.join('old.' + quote_name(c) for c in text_columns)
+    insert = 'INSERT INTO {0}(rowid, {1}) VALUES (new.rowid, {2});'.format(fts, cols, new)
+    delete = "INSERT INTO {0}({0}, rowid, {1}) VALUES ('delete', old.rowid, {2});".format(fts, cols, old)
+    for suffix, event, body in (('ai', 'INSERT', insert), ('ad', 'DELETE', delete), ('au', 'UPDATE', delete + insert)):
+        trigger = quote_name('{}:fts:{}'.format(name, suffix))
+        conn.execute('DROP TRIGGER IF EXISTS {}'.format(trigger))
+        conn.execute('CREATE TRIGGER {} AFTER {} ON {} BEGIN {} END'.format(trigger, event, quote_name(name), body))
+    conn.execute("INSERT INTO {0}({0}) VALUES('rebuild')".format(fts))
+
+
+def _iter_runs(chunks):
+    # Whole scrape runs, rows grouped by dt_scrape, from chunks of a table
+    # appended a run at a time; without dt_scrape, the chunks as they are
+    pending = None
+    for chunk in chunks:
+        if 'dt_scrape' not in chunk.columns:
+            yield chunk
+            continue
+        if pending is not None:
+            chunk = pd.concat([pending, chunk], ignore_index=True)
+        # The last run may go on in the next chunk
+        stamps = chunk['dt_scrape'].astype(str)
+        is_last = stamps.eq(stamps.iloc[-1]).to_numpy()
+        start = len(chunk) - np.argmin(is_last[::-1]) if not is_last.all() else 0
+        for _, run_df in chunk.iloc[:start].groupby(stamps.iloc[:start], sort=False):
+            yield run_df
+        pending = chunk.iloc[start:]
+    if pending is not None and len(pending):
+        yield pending
+
+
+def _last_matching(chunks, column, values):
+    values = set(values)
+    frames = [chunk[chunk[column].isin(values)] for chunk in chunks if column in chunk.columns]
+    if not frames:
+        return pd.DataFrame([])
+    return pd.concat(frames, ignore_index=True).drop_duplicates(column, keep='last').reset_index(drop=True)
+
+
+STORES = {
+    'csv': CsvStore,
+    'parquet': ParquetStore,
+    'sqlite': SqliteStore,
+}
+
+
+def get_store(data_dir, backend=None, **kwargs):
+    backend = backend or os.environ.get('DOGE_STORAGE', 'csv')
+    if backend not in STORES:
+        raise ValueError('unknown storage backend {!r}, expected one of {}'.format(backend, sorted(STORES)))
+    return STORES[backend](data_dir, **kwargs)
+
+
+PARTITION_PREFIX = 'dt_scrape='
+COMPACTED_PREFIX = 'compacted='
+
+
+class PartitionedHistory:
+    """Append-only history table split into one partition per scrape run.
+
+    data/<name>/dt_scrape=<run>.<ext> holds the rows a run added; a compacted
+    partition compacted=<run>.<ext> holds every row up to and including <run>.
+    With SQLite the partitions are tables of those names in data/<name>/doge.sqlite.
+    Partition names sort in run order because dt_scrape is %Y-%m-%d-%H%M.
+    Until the first append, the single-file table data/<name>.<ext> is read
+    as the base.
+    """
+
+    def __init__(self, data_dir, backend=None):
+        self.data_dir = data_dir
+        self.backend = backend
+
+    def _store(self, name):
+        return get_store(os.path.join(self.data_dir, name), self.backend, **self._store_kwargs())
+
+    def _store_kwargs(self):
+        backend = self.backend or os.environ.get('DOGE_STORAGE', 'csv')
+        return {'export_csv': False} if backend in ('parquet', 'sqlite') else {}
+
+    def partitions(self, name):
+        parts = []
+        for stem in self._store(name).tables():
+            for prefix in (COMPACTED_PREFIX, PARTITION_PREFIX):
+                if stem.startswith(prefix):
+                    parts.append((stem[len(prefix):], prefix == COMPACTED_PREFIX, stem))
+        # The newest compacted partition supersedes everything up to its run
+        parts.sort()
+        base = [p for p in parts if p[1]]
+        if base:
+            last = base[-1][0]
+            parts = [base[-1]] + [p for p in parts if not p[1] and p[0] > last]
+        return parts
+
+    def iter_partitions(self, name, as_of=None, columns=None):
+        """Yield one frame per partition, reading only runs up to as_of."""
+        if columns is not None and as_of is not None:
+            columns = list(columns) + ['dt_scrape']
+        store = self._store(name)
+        schema = schema_for(name)
+        parts = self.partitions(name)
+        if not parts:
+            legacy = get_store(self.data_dir, self.backend)
+            if legacy.exists(name):
+                yield _rows_as_of(legacy.load(name, columns=columns), as_of)
+            return
+        for dt_scrape, compacted, stem in parts:
+            if as_of is not None and dt_scrape > as_of and not compacted:
+                break
+            df = store.load(stem, schema, columns)
+            yield _rows_as_of(df, as_of) if compacted else df
+
+    def iter_chunks(self, name, columns=None, chunksize=CHUNK_ROWS, as_of=None):
+        """Like iter_partitions, but in bounded chunks of only `columns`."""
+        if columns is not None and as_of is not None:
+            columns = list(columns) + ['dt_scrape']
+        parts = self.partitions(name)
+        if not parts:
+            legacy = get_store(self.data_dir, self.backend)
+            if legacy.exists(name):
+                for chunk in legacy.iter_chunks(name, columns, chunksize):
+                    yield _rows_as_of(chunk, as_of)
+            return
+        store = self._store(name)
+        for dt_scrape, compacted, stem in parts:
+            if as_of is not None and dt_scrape > as_of and not compacted:
+                break
+            for chunk in store.iter_chunks(stem, columns, chunksize, schema_for(name)):
+                yield _rows_as_of(chunk, as_of) if compacted else chunk
+
+    def load_matching(self, name, column, values):
+        return _last_matching(self.iter_chunks(name), column, values)
+
+    def verify(self, name):
+        parts = self.partitions(name)
+        if not parts:
+            return get_store(self.data_dir, self.backend).verify(name)
+        store = self._store(name)
+        for _, _, stem in parts:
+            store.verify(stem)
+
+    def load(self, name, as_of=None, columns=None):
+        frames = list(self.iter_partitions(name, as_of, columns))
+        if not frames:
+            return pd.DataFrame([])
+        return apply_schema(pd.concat(frames, ignore_index=True), schema_for(name))
+
+    def append(self, name, df):
+        if not len(df):
+            return
+        store = self._store(name)
+        if not self.partitions(name):
+            # First partitioned write: carry the single-file table over as the base
+            base_df = self.load(name)
+            os.makedirs(store.data_dir, exist_ok=True)
+            if len(base_df):
+                last = base_df['dt_scrape'].astype(str).max() if 'dt_scrape' in base_df else '0'
+                store.save(COMPACTED_PREFIX + last, base_df, schema_for(name))
+        os.makedirs(store.data_dir, exist_ok=True)
+        for dt_scrape, part_df in df.groupby(df['dt_scrape'].astype(str), sort=True):
+            stem = PARTITION_PREFIX + dt_scrape
+            if store.exists(stem):
+                # Two runs in the same minute share a dt_scrape stamp
+                part_df = pd.concat([store.load(stem, schema_for(name)), part_df], ignore_index=True)
+            store.save(stem, part_df, schema_for(name))
+
+    def compact(self, name, export=True):
+        """Fold all partitions into one; optionally rewrite data/<name>.<ext>."""
+        parts = self.partitions(name)
+        if len(parts) < 2:
+            return
+        store = self._store(name)
+        df = self.load(name)
+        last = parts[-1][0]
+        store.save(COMPACTED_PREFIX + last, df, schema_for(name))
+        for dt_scrape, compacted, stem in parts:
+            if stem != COMPACTED_PREFIX + last:
+                store.drop(stem)
+        if export:
+            get_store(self.data_dir, self.backend).save(name, df)
+
+
+def _rows_as_of(df, as_of):
+    if as_of is None or 'dt_scrape' not in df.columns:
+        return df
+    return df[df['dt_scrape'].astype(str) <= as_of]
@@ -0,0 +1,194 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from doge_store import quote_name, table_columns
+
+TOKEN_RE = re.compile(r'[0-9a-z]+')
+
+US_STATES = [
+    'Alabama', 'Alaska', 'Arizona', 'Arkansas', 'California', 'Colorado', 'Connecticut', 'Delaware',
+    'Florida', 'Georgia', 'Hawaii', 'Idaho', 'Illinois', 'Indiana', 'Iowa', 'Kansas', 'Kentucky',
+    'Louisiana', 'Maine', 'Maryland', 'Massachusetts', 'Michigan', 'Minnesota', 'Mississippi',
+    'Missouri', 'Montana', 'Nebraska', 'Nevada', 'New Hampshire', 'New Jersey', 'New Mexico',
+    'New York', 'North Carolina', 'North Dakota', 'Ohio', 'Oklahoma', 'Oregon', 'Pennsylvania',
+    'Rhode Island', 'South Carolina', 'South Dakota', 'Tennessee', 'Texas', 'Utah', 'Vermont',
+    'Virginia', 'Washington', 'West Virginia', 'Wisconsin', 'Wyoming',
+]
+
+
+def state_university_profile(state):
+    return {'recipient': {'include': [state, 'University']}}
+
+
+def agency_profile(agency):
+    return {'agency': {'include': [agency]}}
+
+
+ALL_PROFILE = {}
+HAWAII_UNIV_PROFILE = state_university_profile('Hawaii')
+# Hawaii Pacific University is a private school, not part of the UH system
+UH_PROFILE = {'recipient': {'include': ['Hawaii', 'University'], 'exclude': ['Pacific']}}
+
+
+class KeywordIndex:
+    """Inverted index from lowercase tokens to the distinct values of a column.
+
+    A keyword matches a value when it is a case-insensitive substring of it,
+    exactly like str.contains(keyword, case=False, na=False) with a literal
+    pattern. Single-token keywords are resolved on the token vocabulary, the
+    rest by scanning the distinct values; either way the work is per distinct
+    value, not per row, and each keyword is resolved once.
+    """
+
+    def __init__(self, values):
+        codes, self.names = pd.factorize(values, sort=False)
+        self.n_rows = len(codes)
+        # Row positions of each distinct value; NaN (code -1) never matches
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(self.names) + 1))
+        self.rows_by_name = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.names))]
+        self.lower_names = [str(name).lower() for name in self.names]
+        self.postings = {}
+        for name_id, name in enumerate(self.lower_names):
+            for token in set(TOKEN_RE.findall(name)):
+                self.postings.setdefault(token, set()).add(name_id)
+        self._matches = {}
+
+    def match_names(self, keyword):
+        kw = keyword.lower()
+        if kw not in self._matches:
+            if TOKEN_RE.fullmatch(kw):
+                # An alphanumeric substring cannot span a token boundary
+                name_ids = set()
+                for token, ids in self.postings.items():
+                    if kw in token:
+                        name_ids |= ids
+            else:
+                name_ids = {i for i, name in enumerate(self.lower_names) if kw in name}
+            self._matches[kw] = frozenset(name_ids)
+        return self._matches[kw]
+
+    def select_names(self, include=(), exclude=()):
+        name_ids = set(range(len(self.names)))
+        for keyword in include:
+            name_ids &= self.match_names(keyword)
+        for keyword in exclude:
+            name_ids -= self.match_names(keyword)
+        return name_ids
+
+    def mask(self, include=(), exclude=()):
+        mask = np.zeros(self.n_rows, dtype=bool)
+        if not include:
+            # Rows with a missing value pass a pure exclusion, as with ~str.contains(na=False)
+            mask[:] = True
+            for name_id in set(range(len(self.names))) - self.select_names(exclude=exclude):
+                mask[self.rows_by_name[name_id]] = False
+            return mask
+        for name_id in self.select_names(include, exclude):
+            mask[self.rows_by_name[name_id]] = True
+        return mask
+
+
+class GrantIndex:
+    """Keyword indexes over the columns of one grant table, built on first use.
+
+    A profile maps column names to {'include': [...], 'exclude': [...]}
+    keyword lists; select() returns the boolean row mask of the grants that
+    contain every include keyword and none of the exclude keywords.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._indexes = {}
+
+    def column_index(self, column):
+        if column not in self._indexes:
+            self._indexes[column] = KeywordIndex(self.df[column])
+        return self._indexes[column]
+
+    def select(self, profile):
+        mask = np.ones(len(self.df), dtype=bool)
+        for column, rules in profile.items():
+            mask &= self.column_index(column).mask(rules.get('include', ()), rules.get('exclude', ()))
+        return mask
+
+    def filter(self, profile):
+        return self.df[self.select(profile)]
+
+    def head(self, n):
+        return self.df.head(n)
+
+    def __len__(self):
+        return len(self.df)
+
+
+def _contains(value, keyword):
+    return value is not None and keyword in str(value).lower()
+
+
+class GrantQuery:
+    """GrantIndex over a table of a SqliteStore, without loading the table.
+
+    filter() runs the same keyword rules in SQL. Keywords of three or more
+    ASCII characters are first narrowed through the table's FTS5 trigram
+    index. Every keyword is then checked with Python's own lowercase
+    substring test, so the rows are exactly the ones GrantIndex selects.
+    Rows come back in table order, labelled by rowid - 1 (the position in a
+    table written by save()), and pass through `prepare` when given.
+    """
+
+    def __init__(self, store, name, columns=None, prepare=None):
+        self.store = store
+        self.name = name
+        self.columns = [c for c in store.columns(name) if columns is None or c in columns]
+        self.prepare = prepare
+        self._len = None
+
+    def _query(self, where='', params=(), limit=''):
+        sql = 'SELECT rowid - 1 AS pos, {} FROM {}{} ORDER BY rowid{}'.format(
+            ', '.join(map(quote_name, self.columns)), quote_name(self.name), where, limit)
+        with self.store.connect() as conn:
+            conn.create_function('contains_ci', 2, _contains, deterministic=True)
+            df = pd.read_sql_query(sql, conn, params=list(params), index_col='pos')
+        df.index.name = None
+        return self.prepare(df) if self.prepare else df
+
+    def _fts_columns(self):
+        with self.store.connect() as conn:
+            return set(table_columns(conn, self.name + ':fts'))
+
+    def _keyword_sql(self, column, keyword, fts):
+        kw = keyword.lower()
+        sql = 'contains_ci({}, ?)'.format(quote_name(column))
+        params = [kw]
+        if fts and len(kw) >= 3 and kw.isascii():
+            pattern = '%' + kw.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            sql = "rowid IN (SELECT rowid FROM {} WHERE {} LIKE ? ESCAPE '\\') AND ".format(
+                quote_name(self.name + ':fts'), quote_name(column)) + sql
+            params.insert(0, pattern)
+        return sql, params
+
+    def filter(self, profile):
+        fts_columns = self._fts_columns()
+        clauses, params = [], []
+        for column, rules in profile.items():
+            use_fts = column in fts_columns
+            for keyword in rules.get('include', ()):
+                sql, kw_params = self._keyword_sql(column, keyword, use_fts)
+                clauses.append(sql)
+                params += kw_params
+            for keyword in rules.get('exclude', ()):
+                clauses.append('NOT contains_ci({}, ?)'.format(quote_name(column)))
+                params.append(keyword.lower())
+        return self._query(' WHERE ' + ' AND '.join(clauses) if clauses else '', params)
+
+    def head(self, n):
+        return self._query(limit=' LIMIT {:d}'.format(n))
+
+    def __len__(self):
+        if self._len is None:
+            with self.store.connect() as conn:
+                self._len = conn.execute('SELECT COUNT(*) FROM {}'.format(quote_name(self.name))).fetchone()[0]
+        return self._len
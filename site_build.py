@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+
+from doge_diff import row_fingerprints
+
+SITE_CACHE_DIR = os.path.join('.cache', 'site')
+ROW_COLUMNS = ['date', 'agency', 'recipient', 'value', 'savings', 'description_doge', 'link']
+PAGE_TEMPLATE = 'index.html'
+ROW_TEMPLATE = 'grant_row.html'
+
+
+def template_fingerprint(env, *names):
+    sha = hashlib.sha1()
+    for name in names:
+        source, _, _ = env.loader.get_source(env, name)
+        sha.update(source.encode('utf-8'))
+    return sha.hexdigest()
+
+
+class IncrementalSite:
+    """Cache of rendered table rows for the pages generated from one table.
+
+    Rows are keyed by a fingerprint of their raw values, so only rows that are
+    new or changed since the last build are formatted and rendered, whichever
+    page they land on. A page whose rows, context and templates are all
+    unchanged is not written at all. Any template edit invalidates the whole
+    cache.
+    """
+
+    def __init__(self, name, env, full=False, cache_dir=SITE_CACHE_DIR):
+        self.env = env
+        self.cache_path = os.path.join(cache_dir, name + '.json')
+        self.template_fp = template_fingerprint(env, PAGE_TEMPLATE, ROW_TEMPLATE)
+        cache = {} if full else self._load()
+        if cache.get('template_fp') != self.template_fp:
+            cache = {}
+        self.fragments = cache.get('rows', {})
+        self.prev_pages = cache.get('pages', {})
+        self.pages = {}
+        self.used_fps = set()
+        self.n_rendered = 0
+
+    def _load(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def fingerprint_rows(self, df):
+        row_fps = row_fingerprints(df, [c for c in ROW_COLUMNS if c in df.columns]).astype(str)
+        self.used_fps.update(row_fps)
+        return row_fps
+
+    def page_fingerprint(self, row_fps, context):
+        # context must leave out the build time, or no page is ever up to date
+        sha = hashlib.sha1(self.template_fp.encode('utf-8'))
+        sha.update(json.dumps(context, default=str, sort_keys=True).encode('utf-8'))
+        sha.update(' '.join(row_fps).encode('utf-8'))
+        return sha.hexdigest()
+
+    def up_to_date(self, out_path, page_fp):
+        # The output must also still be the file this site last wrote, since
+        # UHgrants.py and allgrants.py both write docs/index.html
+        prev = self.prev_pages.get(out_path)
+        if prev is None or prev[0] != page_fp or _file_sha(out_path) != prev[1]:
+            return False
+        self.pages[out_path] = prev
+        return True
+
+    def missing(self, row_fps):
+        return ~row_fps.isin(set(self.fragments))
+
+    def add_fragments(self, row_fps, fragments):
+        self.fragments.update(zip(row_fps, fragments))
+        self.n_rendered += len(fragments)
+
+    def join_rows(self, row_fps):
+        return '\n'.join(self.fragments[row_fp] for row_fp in row_fps)
+
+    def mark_written(self, out_path, page_fp):
+        self.pages[out_path] = (page_fp, _file_sha(out_path))
+
+    def save(self):
+        # Only fragments of rows still on some page are kept
+        cache = {
+            'template_fp': self.template_fp,
+            'pages': self.pages,
+            'rows': {row_fp: self.fragments[row_fp] for row_fp in self.used_fps if row_fp in self.fragments},
+        }
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+
+
+def write_if_changed(out_path, text):
+    """Write text to out_path unless the file already holds exactly that."""
+    data = text.encode('utf-8')
+    if _file_sha(out_path) == hashlib.sha1(data).hexdigest():
+        return False
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    with open(out_path, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def _file_sha(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+WORD_LIMIT = 50
+# Largest magnitude float64 rounds to exactly as an int64
+EXACT_INT_MAX = 2 ** 53
+
+
+def clean_description(text, link, word_limit=WORD_LIMIT):
+    if not isinstance(text, str):
+        return ""
+    words = text.split()
+    truncated = ' '.join(words[:word_limit]) + ('...' if len(words) > word_limit else '')
+    if truncated:
+        truncated = truncated.lower()
+        truncated = truncated[0].upper() + truncated[1:]
+    if isinstance(link, str) and link.strip():
+        truncated += f' <a href="{link}" target="_blank">[LINK]</a>'
+    return truncated
+
+
+def format_dollar(x):
+    try:
+        return f"${int(round(float(x))):,}"
+    except:
+        return x
+
+
+def _is_str(s):
+    return s.map(type).eq(str)
+
+
+def clean_descriptions(text, link=None, word_limit=WORD_LIMIT):
+    """clean_description over whole columns; link may be None for no links.
+
+    Descriptions repeat a lot, so each distinct one is truncated and cased
+    once and the results are taken back to the rows.
+    """
+    is_text = _is_str(text)
+    out = pd.Series("", index=text.index, dtype=object)
+    if not is_text.any():
+        return out
+    codes, uniques = pd.factorize(text[is_text])
+    words = pd.Series(uniques, dtype=object).str.split()
+    truncated = words.str[:word_limit].str.join(' ')
+    truncated = truncated.where(words.str.len() <= word_limit, truncated + '...').str.lower()
+    truncated = truncated.str[:1].str.upper() + truncated.str[1:]
+    out[is_text] = truncated.to_numpy()[codes]
+    if link is not None:
+        link = link.astype(object).where(_is_str(link), '')
+        has_link = is_text & (link.str.strip() != '')
+        out[has_link] += ' <a href="' + link[has_link] + '" target="_blank">[LINK]</a>'
+    return out
+
+
+def format_dollars(values):
+    """format_dollar over a whole column.
+
+    Finite numbers are rounded half to even by NumPy, as round() does, and
+    formatted in one pass; anything else goes through format_dollar.
+    """
+    out = pd.Series(values, dtype=object, copy=True)
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        nums = values.to_numpy(dtype='float64', na_value=np.nan)
+        fast = np.isfinite(nums) & (np.abs(nums) < EXACT_INT_MAX)
+        out[fast] = ['${:,}'.format(v) for v in np.round(nums[fast]).astype('int64').tolist()]
+    else:
+        fast = np.zeros(len(values), dtype=bool)
+    out[~fast] = [format_dollar(v) for v in values[~fast]]
+    return out
+
+
+def format_grants(df):
+    df['description_doge'] = clean_descriptions(df['description_doge'], df.get('link'))
+    df['value'] = format_dollars(df['value'])
+    df['savings'] = format_dollars(df['savings'])
+    df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.date
+    return df
@@ -0,0 +1,233 @@
+import argparse
+import glob
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from doge_store import SqliteStore, get_store
+from grant_filters import ALL_PROFILE, HAWAII_UNIV_PROFILE, UH_PROFILE, GrantIndex, GrantQuery
+from site_build import PAGE_TEMPLATE, ROW_TEMPLATE, IncrementalSite, write_if_changed
+from site_format import format_grants
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+STUB_NAME = 'doge-grant-stub'
+STUB_CSV = os.path.join('data', STUB_NAME + '.csv')
+GRANT_COLUMNS = {'date', 'agency', 'recipient', 'value', 'savings', 'link', 'description_doge'}
+EXPORT_COLUMNS = ['date', 'agency', 'recipient', 'value', 'savings', 'description_doge', 'link']
+EXPORT_NAME = 'doge-grants.csv'
+PAGE_SIZE = 500
+RENDER_CHUNK_ROWS = 2000
+
+# One entry per generated site. page_size=None writes a single page;
+# date_profile picks the rows behind the "last entry" date (default: profile).
+SITE_PROFILES = {
+    'uh': {
+        'profile': UH_PROFILE,
+        'date_profile': HAWAII_UNIV_PROFILE,
+        'out_dir': 'docs',
+        'page_size': None,
+        'export_csv': False,
+        'time_format': '%Y-%m-%d %H:%M:%S',
+    },
+    'all': {
+        'profile': ALL_PROFILE,
+        'out_dir': os.path.join('docs', 'all'),
+        'page_size': PAGE_SIZE,
+        'export_csv': True,
+        'time_format': '%Y-%m-%d',
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def jinja_env():
+    # One environment per process, templates compiled once; .html ones are
+    # autoescaped as they were under Flask
+    return Environment(loader=FileSystemLoader(TEMPLATE_DIR), auto_reload=False,
+                       autoescape=select_autoescape(('html', 'htm', 'xml', 'xhtml', 'svg')))
+
+
+def shard_filename(page):
+    return 'index.html' if page == 1 else 'page-{}.html'.format(page)
+
+
+def load_grants(csv_path=STUB_CSV):
+    try:
+        df_all = pd.read_csv(csv_path, usecols=lambda c: c in GRANT_COLUMNS)
+    except Exception as e:
+        print(f"<h2>Error loading CSV file: {e}</h2>")
+        return None
+    df_all['date'] = pd.to_datetime(df_all['date'], errors='coerce', format='mixed').dt.date
+    return df_all
+
+
+def prepare_sql_rows(df):
+    # Make rows read from SQLite look like load_grants' rows read from the CSV
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].where(df[col].notna() & (df[col] != ''), np.nan)
+    for col in ('value', 'savings'):
+        if col in df:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    if 'date' in df:
+        df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.date
+    return df
+
+
+def grant_rows(csv_path=STUB_CSV, store=None):
+    """The grants to filter: a GrantQuery on the store's SQLite stub table, else a GrantIndex on the CSV."""
+    if isinstance(store, SqliteStore) and store.has_table(STUB_NAME):
+        return GrantQuery(store, STUB_NAME, GRANT_COLUMNS, prepare_sql_rows)
+    df_all = load_grants(csv_path)
+    return None if df_all is None else GrantIndex(df_all)
+
+
+def plan_pages(spec, grants):
+    """List the pages of one site as (out_path, row labels, context), with the site's rows."""
+    rows = grants.filter(spec['profile'])
+    dates = grants.filter(spec['date_profile'])['date'] if 'date_profile' in spec else rows['date']
+    last_date = dates.max()
+    first_rows = grants.head(2)
+    labels = rows.index
+    context = dict(
+        second_row_date=first_rows['date'].iloc[1] if len(first_rows) > 1 else "N/A",
+        last_hawaii_univ_date=last_date if pd.notna(last_date) else "N/A",
+        total_entries=len(grants),
+        filtered_entries=len(labels),
+    )
+    page_size = spec.get('page_size')
+    if not page_size:
+        return [(os.path.join(spec['out_dir'], 'index.html'), labels, context)], rows
+
+    n_pages = max(1, math.ceil(len(labels) / page_size))
+    page_urls = [shard_filename(page) for page in range(1, n_pages + 1)]
+    pages = []
+    for page in range(1, n_pages + 1):
+        page_context = dict(context, page=page, n_pages=n_pages, page_urls=page_urls)
+        if spec.get('export_csv'):
+            page_context['csv_url'] = EXPORT_NAME
+        pages.append((os.path.join(spec['out_dir'], shard_filename(page)),
+                      labels[(page - 1) * page_size:page * page_size], page_context))
+    return pages, rows
+
+
+def remove_stale_pages(out_dir, n_pages):
+    # Pages left over from a build with more grants
+    for path in glob.glob(os.path.join(out_dir, 'page-*.html')):
+        page = os.path.basename(path)[len('page-'):-len('.html')]
+        if page.isdigit() and int(page) > n_pages:
+            os.remove(path)
+
+
+def _render_row_chunk(grants):
+    row_template = jinja_env().get_template(ROW_TEMPLATE)
+    return [row_template.render(grant=grant) for grant in grants]
+
+
+def _render_page(out_path, rows_html, context):
+    html = jinja_env().get_template(PAGE_TEMPLATE).render(rows_html=rows_html, **context)
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return out_path
+
+
+def build_sites(site_profiles=None, full=False, workers=1, csv_path=STUB_CSV, cache_name='sites', store=None):
+    """Load and index the grants once, then write every configured site.
+
+    With a SqliteStore holding the stub table (DOGE_STORAGE=sqlite for the
+    default data/), each site's rows are queried from it instead of loading
+    the CSV. Rows shared by several sites are
+    formatted and rendered once; with workers > 1 row rendering and page
+    writes are spread over a process pool.
+    """
+    site_profiles = SITE_PROFILES if site_profiles is None else site_profiles
+    if store is None and csv_path == STUB_CSV:
+        store = get_store('data')
+    grants = grant_rows(csv_path, store)
+    if grants is None:
+        return
+    site = IncrementalSite(cache_name, jinja_env(), full=full)
+    now = datetime.now()
+
+    plans = []
+    for name, spec in site_profiles.items():
+        pages, rows = plan_pages(spec, grants)
+        if spec.get('page_size'):
+            remove_stale_pages(spec['out_dir'], len(pages))
+        if spec.get('export_csv'):
+            export_df = rows[[c for c in EXPORT_COLUMNS if c in rows]]
+            write_if_changed(os.path.join(spec['out_dir'], EXPORT_NAME), export_df.to_csv(index=False))
+        plans.append((spec, pages, rows))
+    # Every row any site shows, once
+    df_rows = pd.concat([rows for _, _, rows in plans] or [grants.head(0)])
+    df_rows = df_rows[~df_rows.index.duplicated()]
+    row_fps = site.fingerprint_rows(df_rows)
+
+    todo = []
+    for spec, pages, _ in plans:
+        for out_path, labels, context in pages:
+            page_fps = row_fps.loc[labels]
+            page_fp = site.page_fingerprint(page_fps, context)
+            if not site.up_to_date(out_path, page_fp):
+                context = dict(context, last_scraped=now.strftime(spec.get('time_format', '%Y-%m-%d')))
+                todo.append((out_path, labels, context, page_fp))
+
+    # Each row any stale page needs is formatted and rendered at most once
+    needed = sorted(set().union(*(labels for _, labels, _, _ in todo))) if todo else []
+    needed_fps = row_fps.loc[needed]
+    missing = site.missing(needed_fps)
+    if missing.any():
+        missing_fps = needed_fps[missing].drop_duplicates()
+        records = format_grants(df_rows.loc[missing_fps.index].copy()).to_dict(orient='records')
+        chunks = [records[i:i + RENDER_CHUNK_ROWS] for i in range(0, len(records), RENDER_CHUNK_ROWS)]
+        with _pool(workers, len(chunks)) as pool:
+            fragments = [html for chunk_html in pool.map(_render_row_chunk, chunks) for html in chunk_html]
+        site.add_fragments(missing_fps, fragments)
+
+    out_paths = [out_path for out_path, _, _, _ in todo]
+    rows_html = [site.join_rows(row_fps.loc[labels]) for _, labels, _, _ in todo]
+    contexts = [context for _, _, context, _ in todo]
+    with _pool(workers, len(todo)) as pool:
+        list(pool.map(_render_page, out_paths, rows_html, contexts))
+    for out_path, _, _, page_fp in todo:
+        site.mark_written(out_path, page_fp)
+    site.save()
+    print('wrote {} pages, rendered {} of {} rows'.format(len(todo), site.n_rendered, len(grants)))
+
+
+class _SerialPool:
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def _pool(workers, n_tasks):
+    if workers > 1 and n_tasks > 1:
+        return ProcessPoolExecutor(min(workers, n_tasks))
+    return _SerialPool()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate the static grant sites from data/doge-grant-stub.csv')
+    parser.add_argument('profiles', nargs='*',
+                        help='sites to build (default: all of {})'.format(', '.join(SITE_PROFILES)))
+    parser.add_argument('--full', action='store_true', help='ignore the row cache and render every row')
+    parser.add_argument('--workers', type=int, default=1, help='processes used to render rows and pages')
+    args = parser.parse_args()
+    unknown = [name for name in args.profiles if name not in SITE_PROFILES]
+    if unknown:
+        parser.error('unknown site {}; choose from {}'.format(', '.join(unknown), ', '.join(SITE_PROFILES)))
+    names = args.profiles or list(SITE_PROFILES)
+    build_sites({name: SITE_PROFILES[name] for name in names}, full=args.full, workers=args.workers)